@@ -0,0 +1,64 @@
+"""Compare the direct JSON-LD builder with rdflib's serializer and a re-parse.
+
+    ipython benchmarks/bench_jsonld.py 10000 100000
+"""
+import io
+import sys
+import time
+import tracemalloc
+
+import ujson
+from rdflib import Graph, Literal, Namespace
+
+from ipyrdf.queries.jsonld import graph_context, to_jsonld, write_jsonld
+
+EX = Namespace("http://example.org/")
+
+
+def make_graph(size: int) -> Graph:
+    graph = Graph()
+    graph.bind("ex", EX)
+    for i in range(size):
+        if i % 3 == 0:
+            graph.add((EX[f"s{i // 10}"], EX.label, Literal(f"label {i}")))
+        else:
+            graph.add((EX[f"s{i // 10}"], EX[f"p{i % 7}"], EX[f"s{i // 5}"]))
+    return graph
+
+
+def round_trip(graph: Graph):
+    context = graph_context(graph)
+    return ujson.loads(graph.serialize(format="json-ld", context=context))
+
+
+def stream(graph: Graph):
+    write_jsonld(graph, io.StringIO())
+
+
+def measure(func, graph: Graph):
+    # timed and traced separately as tracing slows allocation down a lot
+    start = time.perf_counter()
+    func(graph)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    func(graph)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2**20
+
+
+def main(sizes):
+    print(f"{'triples':>10} {'path':>10} {'time (s)':>9} {'peak (MiB)':>11}")
+    for size in sizes:
+        graph = make_graph(size)
+        for name, func in [
+            ("rdflib", round_trip),
+            ("direct", to_jsonld),
+            ("stream", stream),
+        ]:
+            elapsed, peak = measure(func, graph)
+            print(f"{size:>10} {name:>10} {elapsed:>9.2f} {peak:>11.1f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000])
@@ -0,0 +1,57 @@
+"""Time the graph difference used by the RDFLoader as the graph grows.
+
+    ipython benchmarks/bench_lifecycle.py 1000 10000 100000 1000000
+"""
+import sys
+import time
+
+from rdflib import Graph, Literal, Namespace
+
+from ipyrdf.queries.lifecycle import graph_delta
+
+EX = Namespace("http://example.org/")
+
+
+def make_graph(size: int) -> Graph:
+    graph = Graph()
+    for i in range(size):
+        if i % 3 == 0:
+            graph.add((EX[f"s{i // 10}"], EX.label, Literal(f"label {i}")))
+        else:
+            graph.add((EX[f"s{i // 10}"], EX[f"p{i % 7}"], EX[f"s{i // 5}"]))
+    return graph
+
+
+def modified(graph: Graph, changes: int) -> Graph:
+    new = Graph()
+    for i, triple in enumerate(graph):
+        if i >= changes:
+            new.add(triple)
+    for i in range(changes):
+        new.add((EX[f"new{i}"], EX.p0, EX.s0))
+    return new
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main(sizes):
+    print(
+        f"{'triples':>10} {'changes':>8} {'delta (s)':>10}"
+        f" {'exiting':>8} {'entering':>8}"
+    )
+    for size in sizes:
+        old = make_graph(size)
+        new = modified(old, max(1, size // 100))
+        elapsed, delta = timed(graph_delta, old, new)
+        print(
+            f"{size:>10} {size // 100:>8} {elapsed:>10.3f}"
+            f" {len(delta.exiting_triples):>8} {len(delta.entering_triples):>8}"
+        )
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000])
@@ -0,0 +1,60 @@
+"""Compare building an RDFPartition triple by triple with the bulk columnar path.
+
+    ipython benchmarks/bench_partition.py 10000 100000
+"""
+import sys
+import time
+import tracemalloc
+
+from rdflib import Graph, Literal, Namespace
+
+from ipyrdf import NSWrapper
+from ipyrdf.rdf_diagram.rdf_diagram import RDFPartition
+
+EX = Namespace("http://example.org/")
+
+
+def make_graph(size: int) -> Graph:
+    graph = Graph()
+    graph.bind("ex", EX)
+    for i in range(size):
+        if i % 3 == 0:
+            graph.add((EX[f"s{i // 10}"], EX.label, Literal(f"label {i}")))
+        else:
+            graph.add((EX[f"s{i // 10}"], EX[f"p{i % 7}"], EX[f"s{i // 5}"]))
+    return graph
+
+
+def single(partition: RDFPartition, graph: Graph):
+    for s, p, o in graph:
+        partition.add_triple(s, p, o)
+
+
+def bulk(partition: RDFPartition, graph: Graph):
+    partition.add_triples(graph)
+
+
+def measure(build, graph: Graph):
+    # timed and traced separately as tracing slows allocation down a lot
+    start = time.perf_counter()
+    build(RDFPartition(ns=NSWrapper(graph=graph)), graph)
+    elapsed = time.perf_counter() - start
+    partition = RDFPartition(ns=NSWrapper(graph=graph))
+    tracemalloc.start()
+    build(partition, graph)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2**20
+
+
+def main(sizes):
+    print(f"{'triples':>10} {'path':>7} {'time (s)':>9} {'peak (MiB)':>11}")
+    for size in sizes:
+        graph = make_graph(size)
+        for name, build in [("single", single), ("bulk", bulk)]:
+            elapsed, peak = measure(build, graph)
+            print(f"{size:>10} {name:>7} {elapsed:>9.2f} {peak:>11.1f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000])
@@ -0,0 +1,54 @@
+"""Time drawing generated SPARQL queries with many UNION or OPTIONAL branches.
+
+    ipython benchmarks/bench_sparql_loop.py 10 100 1000
+"""
+import sys
+import time
+
+from rdflib.plugins.sparql import prepareQuery
+
+from ipyrdf.sparql_diagram.sparql_diagram import SparqlPartition, loop
+
+PREFIX = "PREFIX ex: <http://example.org/>\n"
+
+
+def union_query(branches: int) -> str:
+    union = " UNION ".join(
+        f"{{ ?s ex:p{i} ?o FILTER(?o > {i} && ?o < {i + 10}) }}"
+        for i in range(branches)
+    )
+    return f"{PREFIX}SELECT * WHERE {{ {union} }}"
+
+
+def optional_query(branches: int) -> str:
+    optional = " ".join(
+        f"OPTIONAL {{ ?s ex:p{i} ?o{i} FILTER(?o{i} != ex:x{i}) }}"
+        for i in range(branches)
+    )
+    return f"{PREFIX}SELECT * WHERE {{ ?s a ex:T . {optional} }}"
+
+
+def measure(text: str) -> float:
+    # rdflib parses and translates the nested branches recursively itself,
+    # the drawing runs with the default recursion limit
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, 20 * text.count("{")))
+    try:
+        query = prepareQuery(text)
+    finally:
+        sys.setrecursionlimit(limit)
+    start = time.perf_counter()
+    loop(query.algebra, context=SparqlPartition())
+    return time.perf_counter() - start
+
+
+def main(sizes):
+    print(f"{'branches':>9} {'query':>9} {'time (s)':>9}")
+    for size in sizes:
+        for name, make in [("union", union_query), ("optional", optional_query)]:
+            elapsed = measure(make(size))
+            print(f"{size:>9} {name:>9} {elapsed:>9.2f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10, 100, 1000])
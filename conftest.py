@@ -0,0 +1,7 @@
+# Copyright (c) 2021 ipyrdf contributors.
+# Distributed under the terms of the Modified BSD License.
+
+from IPython.testing.globalipapp import start_ipython
+
+# the cell magics are registered when ipyrdf is imported
+start_ipython()
@@ -0,0 +1,58 @@
+"""Run slow graph work off the kernel thread"""
+import asyncio
+import traceback
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+
+from IPython import get_ipython
+
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+
+
+def executor() -> ThreadPoolExecutor:
+    """Single worker so jobs touching the same partition or graph never overlap"""
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        _EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ipyrdf")
+    return _EXECUTOR
+
+
+def submit(func: Callable, *args, callback: Callable[[Future], None] = None) -> Future:
+    """Run `func(*args)` in the worker thread.
+
+    The `callback` receives the finished future on the event loop of the caller
+    (the kernel's loop inside a notebook) so it may safely update widgets. It is
+    not called for cancelled jobs.
+
+    :param func: function to run in the background
+    :param callback: function called with the future once it is done
+    :return: future of the job
+    """
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    future = executor().submit(func, *args)
+    if callback is not None:
+
+        def done(future: Future):
+            if future.cancelled():
+                return
+            if loop is not None and loop.is_running():
+                loop.call_soon_threadsafe(callback, future)
+            else:
+                callback(future)
+
+        future.add_done_callback(done)
+    return future
+
+
+def report_error():
+    """Show the exception being handled in the notebook. Exceptions raised by
+    callbacks of the event loop would otherwise only reach the kernel log.
+    """
+    shell = get_ipython()
+    if shell is None:
+        traceback.print_exc()
+    else:
+        shell.showtraceback()
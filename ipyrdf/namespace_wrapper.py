@@ -1,6 +1,10 @@
-from typing import Dict
+from collections import defaultdict
+from typing import Dict, Iterable, Set
 
-from rdflib import Graph, Namespace
+from rdflib import Graph, Literal, Namespace, URIRef, Variable
+from rdflib.namespace import split_uri
+
+from .versioning import graph_version
 
 ipython_checks = [
     "_ipython_canary_method_should_not_exist_",
@@ -39,6 +43,9 @@ class CuratedNamespace(Namespace):
     def _add(self, term):
         self._terms.add(term)
 
+    def _add_terms(self, terms: Iterable[str]):
+        self._terms.update(terms)
+
     def __dir__(self):
         return list(self._terms)
 
@@ -59,6 +66,7 @@ class NSWrapper:
             graph = Graph()
         self.__dict__["_graph"] = graph
         self.__dict__["_cnsp"] = cnsp = dict()
+        self.__dict__["_labels"] = dict()
 
         if names is not None:
             for name, space in names.items():
@@ -67,19 +75,49 @@ class NSWrapper:
         for key, value in graph.namespaces():
             cnsp[key] = CuratedNamespace(value)
 
+    @classmethod
+    def from_graph(cls, graph: Graph, names: Dict = None) -> "NSWrapper":
+        """
+        create a ns wrapper with curated terms for every uri used in the graph
+        """
+        ns = cls(graph=graph, names=names)
+        ns.sync_terms()
+        return ns
+
+    def sync_terms(self):
+        """Register the uris used by the graph as curated terms. When the graph
+        is a `VersionedGraph` that was synced before, only the triples added
+        since the last sync are visited.
+        """
+        graph = self._graph
+        data = self.__dict__
+        version = graph_version(graph)
+        last = data.get("_terms_version")
+        changes = None
+        if version is not None and last is not None:
+            changes = graph.changes_since(last)
+        triples = graph if changes is None else changes[0]
+        self.register_terms({term for triple in triples for term in triple})
+        data["_terms_version"] = version
+
     def __getattr__(self, name):
         """
         wrap a namespace uri in Namespace
 
         q.ns.rdfs.label
         """
+        if name.startswith("__"):  # ignore any special Python names!
+            raise AttributeError(name)
         data = self.__dict__
-        nsp = dict(data["_graph"].namespaces())
-        cnsp = data["_cnsp"]
-        if name in nsp:
-            if name not in cnsp:
-                cnsp[name] = CuratedNamespace(nsp[name])
-            return cnsp[name]
+        # single prefix lookup on the store keeps the index in sync with any
+        # binding made directly on the graph
+        uri = data["_graph"].namespace_manager.store.namespace(name)
+        if uri is not None:
+            cnsp = data["_cnsp"]
+            curated = cnsp.get(name)
+            if curated is None or not str.__eq__(curated, uri):
+                cnsp[name] = curated = CuratedNamespace(uri)
+            return curated
         elif name == "_ipython_canary_method_should_not_exist_":
             # implemented so ipython can find rich repr method
             raise AttributeError("Ipython canary should not exist")
@@ -91,6 +129,8 @@ class NSWrapper:
         """
         self._graph.namespace_manager.bind(prefix, Namespace(uri_frag))
         self._cnsp[prefix] = CuratedNamespace(uri_frag)
+        # qnames may now use the new prefix
+        self._labels.clear()
 
     def __dir__(self):
         """
@@ -102,6 +142,33 @@ class NSWrapper:
         """Get the qualified name for the given key"""
         return self._graph.qname(key)
 
+    def label(self, term) -> str:
+        """Get the display text for the term, computed once per distinct term"""
+        labels = self.__dict__["_labels"]
+        try:
+            return labels[term]
+        except KeyError:
+            pass
+        if isinstance(term, URIRef):
+            text = self[term]  # get the qname from the namespace manager
+        elif isinstance(term, Variable):
+            text = "?" + str(term)
+        elif isinstance(term, Literal):
+            text = term.n3(self._graph.namespace_manager)
+        else:
+            text = str(term)
+        labels[term] = text
+        return text
+
+    def labels_for(self, terms: Iterable) -> Dict:
+        """Get the display text for each of the distinct terms
+
+        :param terms: rdf terms, may contain duplicates
+        :return: display text keyed by term
+        """
+        label = self.label
+        return {term: label(term) for term in set(terms)}
+
     def _add(self, uri):
         """Splits the given uri and adds the term to the prefixed curated namespace
         :param uri: URI
@@ -117,6 +184,38 @@ class NSWrapper:
         if isinstance(cnsp, CuratedNamespace):
             cnsp[":".join(suffix)]
 
+    def register_terms(self, uris: Iterable):
+        """Add the terms of many uris to their prefixed curated namespaces.
+
+        Uris are grouped by the longest bound namespace they start with and
+        each curated namespace is updated once. Unlike `_add`, uris outside of
+        the bound namespaces are skipped instead of binding generated prefixes.
+
+        :param uris: URIs, other terms are ignored
+        """
+        by_uri = {str(uri): prefix for prefix, uri in self._graph.namespaces()}
+        ordered = sorted(by_uri, key=len, reverse=True)
+        grouped: Dict[str, Set[str]] = defaultdict(set)
+        for uri in uris:
+            if not isinstance(uri, URIRef):
+                continue
+            try:
+                namespace = split_uri(uri)[0]
+            except ValueError:
+                namespace = None
+            if namespace not in by_uri:
+                namespace = next((ns for ns in ordered if uri.startswith(ns)), None)
+                if namespace is None:
+                    continue
+            suffix = uri[len(namespace) :]
+            if suffix:
+                grouped[by_uri[namespace]].add(suffix)
+
+        for prefix, terms in grouped.items():
+            cnsp = getattr(self, prefix)
+            if isinstance(cnsp, CuratedNamespace):
+                cnsp._add_terms(terms)
+
     def _repr_html_(self):
         namespaces = dict(self._graph.namespaces())
         try:
@@ -1,7 +1,17 @@
-from .summary import describe, get_distinct_ends, to_jsonld
+from .aggregate import AggregateGraph, aggregate
+from .jsonld import iter_jsonld, to_jsonld, write_jsonld
+from .lifecycle import GraphDelta, graph_delta
+from .summary import describe, get_distinct_ends, summary_counts
 
 __all__ = [
+    "aggregate",
+    "AggregateGraph",
     "describe",
     "get_distinct_ends",
+    "graph_delta",
+    "GraphDelta",
+    "iter_jsonld",
+    "summary_counts",
     "to_jsonld",
+    "write_jsonld",
 ]
@@ -0,0 +1,144 @@
+"""Collapse the terms of a large graph into groups to keep its diagram small"""
+from collections import Counter, defaultdict
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from rdflib import RDF, RDFS, BNode, Graph, Literal, URIRef
+from rdflib.namespace import split_uri
+from rdflib.term import Node
+
+BLANK_GROUP = BNode("ipyrdf-blank-nodes")
+OTHER_GROUP = BNode("ipyrdf-other-terms")
+
+
+class AggregateGraph(Graph):
+    """Graph between groups of terms, drawn in place of a graph that is too large.
+
+    `counts` records how many terms each group node stands for and `members`
+    the terms themselves, so a selected group can be expanded.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.counts: Dict[Node, int] = {}
+        self.members: Dict[Node, Set[Node]] = {}
+
+
+def namespace_grouper(graph: Graph) -> Callable[[Node], Node]:
+    """Group terms by the longest namespace bound in the graph that prefixes them,
+    falling back to splitting the uri.
+    """
+    namespaces = sorted(
+        (str(uri) for _, uri in graph.namespaces()), key=len, reverse=True
+    )
+
+    def group(term: Node) -> Node:
+        if not isinstance(term, URIRef):
+            return BLANK_GROUP
+        for namespace in namespaces:
+            if term.startswith(namespace):
+                return URIRef(namespace)
+        try:
+            return URIRef(split_uri(term)[0])
+        except ValueError:
+            return term
+
+    return group
+
+
+def type_grouper(graph: Graph) -> Callable[[Node], Node]:
+    """Group terms by their rdf:type, untyped terms are grouped as rdfs:Resource"""
+    types: Dict[Node, Node] = {}
+    for s, o in graph.subject_objects(RDF.type):
+        if s not in types or o < types[s]:
+            types[s] = o  # smallest type keeps the grouping deterministic
+
+    def group(term: Node) -> Node:
+        return types.get(term, RDFS.Resource)
+
+    return group
+
+
+GROUPERS = {
+    "namespace": namespace_grouper,
+    "type": type_grouper,
+}
+
+
+def aggregate(
+    graph: Graph,
+    by: str = "namespace",
+    max_groups: Optional[int] = None,
+    max_edges: Optional[int] = None,
+) -> AggregateGraph:
+    """Build a graph whose nodes are groups of the subject and object terms of
+    the input graph. Each predicate linking two groups is kept once and
+    literal values are folded into their subject's group.
+
+    :param graph: input graph
+    :param by: grouping strategy, either `namespace` or `type`
+    :param max_groups: keep the largest groups and merge the others into a
+    single `OTHER_GROUP` node so there are at most this many groups
+    :param max_edges: keep the edges standing for the most triples
+    :return: graph between the groups
+    """
+    group = GROUPERS[by](graph)
+    groups: Dict[Node, Node] = {}
+    members: Dict[Node, Set[Node]] = defaultdict(set)
+
+    def lookup(term: Node) -> Node:
+        if term not in groups:
+            groups[term] = key = group(term)
+            members[key].add(term)
+        return groups[term]
+
+    # number of triples behind each edge between groups
+    edges: Counter = Counter()
+    for s, p, o in graph:
+        source = lookup(s)
+        if isinstance(o, Literal):
+            continue
+        edges[source, p, lookup(o)] += 1
+
+    if max_groups and len(members) > max_groups:
+        members, merged = _merge_smallest(members, max(max_groups - 1, 0))
+        folded: Counter = Counter()
+        for (s, p, o), count in edges.items():
+            folded[merged.get(s, s), p, merged.get(o, o)] += count
+        edges = folded
+    if max_edges is None or len(edges) <= max_edges:
+        kept = edges
+    else:
+        kept = [edge for edge, _ in edges.most_common(max_edges)]
+
+    result = AggregateGraph(namespace_manager=graph.namespace_manager)
+    result.addN((s, p, o, result) for s, p, o in kept)
+    result.counts = {key: len(terms) for key, terms in members.items()}
+    result.members = dict(members)
+    return result
+
+
+def _merge_smallest(
+    members: Dict[Node, Set[Node]], keep: int
+) -> Tuple[Dict[Node, Set[Node]], Dict[Node, Node]]:
+    """Merge all but the `keep` largest groups into `OTHER_GROUP`
+
+    :return: members of the remaining groups and the new key of merged groups
+    """
+    # largest first, ties broken by key so the grouping is deterministic
+    ranked = sorted(members, key=lambda key: (-len(members[key]), key))
+    kept = {key: members[key] for key in ranked[:keep]}
+    other: Set[Node] = set()
+    merged: Dict[Node, Node] = {}
+    for key in ranked[keep:]:
+        other.update(members[key])
+        merged[key] = OTHER_GROUP
+    kept[OTHER_GROUP] = other
+    return kept, merged
+
+
+def expand(graph: AggregateGraph, keys: List[Node]) -> List[Node]:
+    """Replace the group keys by their member terms"""
+    terms = []
+    for key in keys:
+        terms.extend(graph.members.get(key, [key]))
+    return terms
@@ -0,0 +1,34 @@
+"""Bounded memory membership test for streaming de-duplication"""
+import math
+from typing import Hashable
+
+
+class BloomFilter:
+    """Probabilistic set that never forgets an added item but may report an
+    item as present that was never added.
+
+    :param capacity: expected number of distinct items
+    :param error_rate: false positive probability once `capacity` items are added
+    """
+
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 0.001):
+        capacity = max(1, int(capacity))
+        size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.size = max(8, size)
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: Hashable):
+        # double hashing: h1 + i * h2 gives `hashes` independent positions
+        h1 = hash(item)
+        h2 = hash((h1, item)) | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, item: Hashable):
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: Hashable) -> bool:
+        bits = self._bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
@@ -0,0 +1,145 @@
+"""Build JSON-LD straight from the triples of a graph"""
+import math
+from typing import IO, Callable, Dict, Iterator, List, Tuple
+
+import ujson
+from rdflib import RDF, XSD, BNode, Graph, Literal, URIRef
+from rdflib.term import Node
+
+# literal datatypes written as native json values
+NATIVE_TYPES = {XSD.boolean, XSD.integer, XSD.double, XSD.string}
+
+
+def graph_context(graph: Graph) -> Dict[str, str]:
+    """JSON-LD context mapping the prefixes bound in the graph to their namespace"""
+    return {k: str(v) for k, v in graph.namespaces()}
+
+
+def to_jsonld(graph: Graph, context: Dict = None) -> Dict:
+    """Helper function to generate json-ld from the input rdf graph.
+
+    Triples are grouped by subject in a single pass over the graph, so neither
+    a serialized string nor a second parse is needed. Iris are compacted with
+    the prefixes of the context and boolean, integer, double and string
+    literals are written as native values. rdf lists are kept as linked blank
+    nodes.
+
+    :param graph: input graph
+    :param context: json-ld context, if not provided it will extract the namespaces
+    from the input graph
+    :return: json-ld with the context and a `@graph` of node objects
+    """
+    if context is None:
+        context = graph_context(graph)
+    node_id, node_value = _converters(context)
+    nodes: Dict[Node, Dict] = {}
+    for s, p, o in graph:
+        node = nodes.get(s)
+        if node is None:
+            node = nodes[s] = {"@id": node_id(s)}
+        _add_value(node, p, o, node_id, node_value)
+    return {"@context": context, "@graph": list(nodes.values())}
+
+
+def iter_jsonld(graph: Graph, context: Dict = None) -> Iterator[Dict]:
+    """Stream the node objects of the graph, one subject at a time
+
+    :param graph: input graph
+    :param context: json-ld context used to compact iris, if not provided it
+    will extract the namespaces from the input graph
+    :return: node objects in the same form as the `@graph` of `to_jsonld`
+    """
+    if context is None:
+        context = graph_context(graph)
+    node_id, node_value = _converters(context)
+    # `subjects(unique=True)` needs rdflib 6
+    for s in dict.fromkeys(graph.subjects()):
+        node = {"@id": node_id(s)}
+        for p, o in graph.predicate_objects(s):
+            _add_value(node, p, o, node_id, node_value)
+        yield node
+
+
+def write_jsonld(graph: Graph, fp: IO[str], context: Dict = None):
+    """Write the json-ld of `to_jsonld` to a text file without building it first
+
+    :param graph: input graph
+    :param fp: writable text file
+    :param context: json-ld context, if not provided it will extract the namespaces
+    from the input graph
+    """
+    if context is None:
+        context = graph_context(graph)
+    fp.write('{"@context":')
+    fp.write(ujson.dumps(context))
+    fp.write(',"@graph":[')
+    for i, node in enumerate(iter_jsonld(graph, context)):
+        if i:
+            fp.write(",")
+        fp.write(ujson.dumps(node))
+    fp.write("]}")
+
+
+def _converters(context: Dict) -> Tuple[Callable, Callable]:
+    """Functions converting terms to json-ld ids and values for the context"""
+    namespaces: List[Tuple[str, str]] = sorted(
+        ((uri, prefix) for prefix, uri in context.items() if isinstance(uri, str)),
+        key=lambda item: len(item[0]),
+        reverse=True,
+    )
+    compacted: Dict[str, str] = {}
+
+    def compact(iri: str) -> str:
+        text = compacted.get(iri)
+        if text is None:
+            text = str(iri)
+            for namespace, prefix in namespaces:
+                if len(iri) > len(namespace) and iri.startswith(namespace):
+                    text = f"{prefix}:{iri[len(namespace):]}"
+                    break
+            compacted[iri] = text
+        return text
+
+    def node_id(term: Node) -> str:
+        if isinstance(term, BNode):
+            return term.n3()
+        return compact(term)
+
+    def node_value(term: Node):
+        if isinstance(term, URIRef):
+            return {"@id": compact(term)}
+        if not isinstance(term, Literal):
+            return {"@id": node_id(term)}
+        if term.datatype in NATIVE_TYPES:
+            value = term.toPython()
+            if isinstance(value, float) and not math.isfinite(value):
+                # json has no NaN or infinity, keep the xsd lexical form
+                if math.isnan(value):
+                    lexical = "NaN"
+                else:
+                    lexical = "INF" if value > 0 else "-INF"
+                return {"@type": compact(term.datatype), "@value": lexical}
+            if not isinstance(value, Literal):
+                return value
+        if term.datatype:
+            return {"@type": compact(term.datatype), "@value": str(term)}
+        if term.language:
+            return {"@language": term.language, "@value": str(term)}
+        return str(term)
+
+    return node_id, node_value
+
+
+def _add_value(node: Dict, p: Node, o: Node, node_id, node_value):
+    """Add the object to the node, turning repeated predicates into lists"""
+    if p == RDF.type:
+        key, value = "@type", node_id(o)
+    else:
+        key, value = node_id(p), node_value(o)
+    existing = node.get(key)
+    if existing is None:
+        node[key] = value
+    elif isinstance(existing, list):
+        existing.append(value)
+    else:
+        node[key] = [existing, value]
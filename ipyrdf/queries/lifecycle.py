@@ -0,0 +1,107 @@
+"""Compute the difference between two graphs using the store indexes"""
+from typing import Iterable, NamedTuple, Set, Tuple
+
+from rdflib import Graph
+from rdflib.term import Node
+
+Triple = Tuple[Node, Node, Node]
+
+
+class GraphDelta(NamedTuple):
+    exiting_terms: Set[Node]
+    exiting_triples: Set[Triple]
+    entering_terms: Set[Node]
+    entering_triples: Set[Triple]
+
+
+def graph_delta(old: Graph, new: Graph) -> GraphDelta:
+    """Find the triples and the subject / object terms that leave and enter when
+    going from the `old` graph to the `new` graph.
+
+    Each graph is walked once and membership is checked with fully bound
+    pattern lookups against the other store, so no intermediate set of all
+    triples is built. Terms are only checked when they appear in a changed
+    triple, keeping that part proportional to the size of the change.
+
+    :param old: graph currently displayed, `None` is treated as empty
+    :param new: graph to display, `None` is treated as empty
+    :return: exiting terms, exiting triples, entering terms and entering triples
+    """
+    if not isinstance(old, Graph):
+        old = Graph()
+    if not isinstance(new, Graph):
+        new = Graph()
+    if old is new:
+        return GraphDelta(set(), set(), set(), set())
+
+    exiting_triples = missing_triples(old, new)
+    entering_triples = missing_triples(new, old)
+    return GraphDelta(
+        exiting_terms=missing_terms(exiting_triples, new),
+        exiting_triples=exiting_triples,
+        entering_terms=missing_terms(entering_triples, old),
+        entering_triples=entering_triples,
+    )
+
+
+def changes_delta(
+    graph: Graph, added: Set[Triple], removed: Set[Triple]
+) -> GraphDelta:
+    """Build the delta of a graph changed in place from its changed triples, e.g.
+    taken from the changelog of a `VersionedGraph`
+
+    :param graph: graph after the changes
+    :param added: triples added to the graph
+    :param removed: triples removed from the graph
+    :return: exiting terms, exiting triples, entering terms and entering triples
+    """
+    return GraphDelta(
+        exiting_terms=missing_terms(removed, graph),
+        exiting_triples=set(removed),
+        entering_terms=only_used_by(added, graph),
+        entering_triples=set(added),
+    )
+
+
+def only_used_by(triples: Set[Triple], graph: Graph) -> Set[Node]:
+    """Subject and object terms of `triples` that no other triple of the graph
+    uses as a subject or object
+    """
+    candidates = set()
+    for s, p, o in triples:
+        candidates.add(s)
+        candidates.add(o)
+    return {
+        term
+        for term in candidates
+        if all(
+            triple in triples
+            for pattern in [(term, None, None), (None, None, term)]
+            for triple in graph.triples(pattern)
+        )
+    }
+
+
+def missing_triples(graph: Graph, other: Graph) -> Set[Triple]:
+    """Triples of `graph` that are not in `other`"""
+    if len(other) == 0:
+        return set(graph)
+    return {triple for triple in graph if triple not in other}
+
+
+def missing_terms(triples: Iterable[Triple], other: Graph) -> Set[Node]:
+    """Subject and object terms of `triples` that are not used as a subject or
+    object of `other`
+    """
+    candidates = set()
+    for s, p, o in triples:
+        candidates.add(s)
+        candidates.add(o)
+    if len(other) == 0:
+        return candidates
+    return {term for term in candidates if not has_end(other, term)}
+
+
+def has_end(graph: Graph, term: Node) -> bool:
+    """Test if the term is used as either a subject or an object in the graph"""
+    return (term, None, None) in graph or (None, None, term) in graph
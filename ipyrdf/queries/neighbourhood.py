@@ -0,0 +1,66 @@
+"""Adjacency index to speed up repeated neighbourhood lookups"""
+import weakref
+from collections import defaultdict
+from typing import Dict, Iterator, List, Tuple
+
+from rdflib import Graph
+from rdflib.term import Node
+
+from ..versioning import graph_version
+
+Triple = Tuple[Node, Node, Node]
+
+_INDEXES: Dict[int, Tuple[weakref.ref, int, "NeighbourhoodIndex"]] = {}
+
+
+class NeighbourhoodIndex:
+    """Map every subject and object term of a graph to the triples using it.
+
+    Building the index costs one pass over the graph, after which the triples
+    around a term are a dictionary lookup instead of two store pattern queries.
+    """
+
+    def __init__(self, graph: Graph):
+        adjacency: Dict[Node, List[Triple]] = defaultdict(list)
+        for triple in graph:
+            s, p, o = triple
+            adjacency[s].append(triple)
+            if o != s:
+                adjacency[o].append(triple)
+        self._adjacency = dict(adjacency)
+
+    def triples(self, term: Node) -> List[Triple]:
+        return self._adjacency.get(term, [])
+
+
+def graph_neighbours(graph: Graph, term: Node) -> Iterator[Triple]:
+    """Triples where the term is either the subject or the object"""
+    yield from graph.triples((term, None, None))
+    for triple in graph.triples((None, None, term)):
+        if triple[0] != term:
+            yield triple
+
+
+def neighbourhood_index(graph: Graph) -> NeighbourhoodIndex:
+    """Get the adjacency index for the graph, building it if the graph has not
+    been indexed yet or changed since it was indexed.
+
+    Only graphs tracking their version (`VersionedGraph`) are cached, as the
+    changes of other graphs cannot be detected.
+
+    :param graph: graph to index
+    :return: cached index, or a new one for graphs without a version
+    """
+    version = graph_version(graph)
+    if version is None:
+        return NeighbourhoodIndex(graph)
+    key = id(graph)
+    cached = _INDEXES.get(key)
+    if cached is not None:
+        ref, indexed, index = cached
+        if ref() is graph and indexed == version:
+            return index
+    index = NeighbourhoodIndex(graph)
+    ref = weakref.ref(graph, lambda _: _INDEXES.pop(key, None))
+    _INDEXES[key] = (ref, version, index)
+    return index
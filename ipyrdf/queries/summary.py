@@ -1,91 +1,154 @@
 """Collect generic queries to help summary activities"""
-from typing import Dict, Iterator, List, Tuple, Type
+from functools import partial
+from typing import Dict, Iterable, Iterator, List, Tuple, Type, Union
+
+from rdflib import BNode, Graph, Literal, URIRef
+from rdflib.term import Node
+
+from ..versioning import graph_version
+from .bloom import BloomFilter
+from .jsonld import to_jsonld  # noqa: F401
+from .neighbourhood import (
+    NeighbourhoodIndex,
+    graph_neighbours,
+    neighbourhood_index,
+)
+
+
+def get_distinct_ends(
+    graph,
+    match: Tuple[Type] = None,
+    approximate: bool = False,
+    capacity: int = 1_000_000,
+    error_rate: float = 0.001,
+) -> Iterator[URIRef]:
+    """Stream the distinct terms used as a subject or an object of the graph.
+
+    Terms are filtered by type before they are de-duplicated, so excluded terms
+    (e.g. literals) are never held in memory.
 
-import ujson
-from jinja2 import Template
-from rdflib import Graph, URIRef
-
-
-def get_distinct_ends(graph, match: Tuple[Type] = None) -> Iterator[URIRef]:
-    template = Template(
-        """
-        SElECT DISTINCT ?s
-        WHERE {
-            {
-                ?s ?p ?o
-            } UNION {
-                ?o ?p ?s
-            }
-
-        }
+    :param graph: input graph
+    :param match: only yield the terms that are instances of these types
+    :param approximate: track seen terms with a bloom filter of bounded size
+    instead of a set. No term is yielded twice but a few distinct terms may be
+    skipped as false positives.
+    :param capacity: expected number of distinct terms for the bloom filter
+    :param error_rate: bloom filter false positive rate at `capacity`
     """
-    )
-    for result in graph.query(template.render()):
-        if match and not isinstance(result[0], match):
-            continue
-        yield result[0]
+    seen = BloomFilter(capacity, error_rate) if approximate else set()
+    for terms in (graph.subjects(), graph.objects()):
+        for term in terms:
+            if match and not isinstance(term, match):
+                continue
+            if term in seen:
+                continue
+            seen.add(term)
+            yield term
 
 
 def count_distinct_subjects(graph, match: Tuple[Type] = None) -> int:
-    template = Template(
-        """
-        SELECT (COUNT(DISTINCT ?s) AS ?subjects) WHERE { ?s ?p ?o }
-    """
-    )
-    for result in graph.query(template.render()):
-        if match and not isinstance(result[0], match):
-            continue
-        return int(result[0])
+    return count_distinct(graph.subjects(), match)
 
 
 def count_distinct_predicates(graph, match: Tuple[Type] = None) -> int:
-    template = Template(
-        """
-        SELECT (COUNT(DISTINCT ?p) AS ?subjects) WHERE { ?s ?p ?o }
-    """
-    )
-    for result in graph.query(template.render()):
-        if match and not isinstance(result[0], match):
-            continue
-        return int(result[0])
+    return count_distinct(graph.predicates(), match)
 
 
 def count_distinct_objects(graph, match: Tuple[Type] = None) -> int:
-    template = Template(
-        """
-        SELECT (COUNT(DISTINCT ?o) AS ?subjects) WHERE { ?s ?p ?o }
-    """
-    )
-    for result in graph.query(template.render()):
-        if match and not isinstance(result[0], match):
-            continue
-        return int(result[0])
+    return count_distinct(graph.objects(), match)
+
+
+def count_distinct(terms: Iterable[Node], match: Tuple[Type] = None) -> int:
+    """Count the distinct terms, only considering the terms of the `match` types"""
+    if match:
+        terms = (term for term in terms if isinstance(term, match))
+    return len(set(terms))
 
 
-def to_jsonld(graph: Graph, context: Dict = None) -> Dict:
-    """Helper function to generate json-ld from the input rdf graph
+def summary_counts(graph: Graph, match: Tuple[Type] = None) -> Dict[str, int]:
+    """Count the triples and the distinct subjects, predicates and objects of the
+    graph in a single traversal of the store.
 
     :param graph: input graph
-    :param context: json-ld context, if not provided it will extract the namespaces
-    from the input graph
-    :return: json-ld
+    :param match: only count the terms that are instances of these types
+    :return: counts keyed by `triples`, `subjects`, `predicates` and `objects`
     """
-    if context is None:
-        context = {k: str(v) for k, v in graph.namespaces()}
-    return ujson.loads(graph.serialize(format="json-ld", context=context))
-
+    subjects, predicates, objects = set(), set(), set()
+    triples = 0
+    for s, p, o in graph:
+        triples += 1
+        if not match:
+            subjects.add(s)
+            predicates.add(p)
+            objects.add(o)
+            continue
+        if isinstance(s, match):
+            subjects.add(s)
+        if isinstance(p, match):
+            predicates.add(p)
+        if isinstance(o, match):
+            objects.add(o)
+    return {
+        "triples": triples,
+        "subjects": len(subjects),
+        "predicates": len(predicates),
+        "objects": len(objects),
+    }
+
+
+def describe(
+    graph: Graph,
+    uris: List[URIRef],
+    depth: int = 1,
+    max_triples: int = None,
+    index: Union[bool, NeighbourhoodIndex] = False,
+) -> Graph:
+    """Collect the triples within `depth` hops of the given uris.
+
+    The neighbourhood is expanded breadth first, each term is looked up at most
+    once and the collected triples are added to the result in bulk.
 
-def describe(graph: Graph, uris: List[URIRef]) -> Graph:
-    if isinstance(uris, URIRef):
+    :param graph: input graph
+    :param uris: focus uris
+    :param depth: number of hops to expand from the focus uris, defaults to 1
+    :param max_triples: stop collecting once this many triples are found
+    :param index: adjacency index to use for lookups, or `True` to use the index
+    cached for a `VersionedGraph`, other graphs are looked up in their store
+    :return: graph of the neighbourhood
+    """
+    if isinstance(uris, (URIRef, BNode)):
         uris = [uris]
+    if index is True and graph_version(graph) is None:
+        # the index of an untracked graph could be stale, or built for one call
+        index = None
+    elif index is True:
+        index = neighbourhood_index(graph)
+    neighbours = index.triples if index else partial(graph_neighbours, graph)
+
+    def full() -> bool:
+        return max_triples is not None and len(triples) >= max_triples
+
+    triples = {}  # insertion ordered set of the collected triples
+    visited = set()
+    frontier = list(dict.fromkeys(uris))
+    for _ in range(depth):
+        next_frontier = {}
+        for term in frontier:
+            visited.add(term)
+            for triple in neighbours(term):
+                if full():
+                    break
+                if triple in triples:
+                    continue
+                triples[triple] = None
+                s, p, o = triple
+                end = o if s == term else s
+                if end not in visited and not isinstance(end, Literal):
+                    next_frontier[end] = None
+        if full():
+            break
+        frontier = [term for term in next_frontier if term not in visited]
 
     result = Graph(namespace_manager=graph.namespace_manager)
-    for uri in uris:
-        patterns = [
-            [uri, None, None],
-            [None, None, uri],
-        ]
-        for pattern in patterns:
-            for spo in graph.triples(pattern):
-                result.add(spo)
+    result.addN((s, p, o, result) for s, p, o in triples)
     return result
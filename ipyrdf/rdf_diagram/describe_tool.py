@@ -1,44 +1,402 @@
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import Future
+from functools import partial
+from itertools import islice
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
 import traitlets as T
 from ipyelk import Diagram, MarkElementWidget, tools
 from rdflib import BNode, Graph, URIRef, term
 
-from ..queries import describe
-from .rdf_diagram import RDFElement
-from .rdf_loader import RDFLoader
+from .. import background
+from ..queries import describe, get_distinct_ends
+from ..queries.aggregate import GROUPERS, AggregateGraph, aggregate, expand
+from ..versioning import graph_version
+from .rdf_diagram import PREDICATE_MODES, RDFAggregate, RDFElement
+from .rdf_loader import LoadDiff, RDFLoader
+
+
+class Render(NamedTuple):
+    loader: RDFLoader
+    subgraph: Graph
+    source: MarkElementWidget
+    size: int
+
+
+class Selection(NamedTuple):
+    """What to draw, read on the event loop before a worker describes it"""
+
+    epoch: int
+    graph: Graph
+    uris: Optional[Tuple]
+    lazy: bool
+    depth: int
+    node_budget: Optional[int]
+    group_by: str
 
 
 class DescribeTool(tools.SetTool):
     diagram = T.Instance(Diagram, allow_none=True)
     graph = T.Instance(Graph)
     uris = T.List(T.Instance(term.Identifier), allow_none=True)
+    depth = T.Int(1, help="number of hops described around the uris")
+    node_budget = T.Int(
+        1000,
+        allow_none=True,
+        help=(
+            "above this many nodes the graph is drawn as aggregate nodes, also "
+            "caps the groups and edges of that overview and the number of "
+            "triples described around the uris"
+        ),
+    )
+    group_by = T.Enum(tuple(GROUPERS), default_value="namespace")
+    predicate_mode = T.Enum(
+        PREDICATE_MODES,
+        default_value="edges",
+        help="draw an edge per triple, or bundle parallel predicates to cut edges",
+    )
+    lazy = T.Bool(
+        False, help="only draw the triples described around the uris, never the graph"
+    )
     subgraph = T.Instance(Graph, kw={})
     loader = T.Instance(RDFLoader, kw={})
     source = T.Instance(MarkElementWidget, kw={})
+    threaded = T.Bool(False, help="describe and load selections in a worker thread")
+    loading = T.Bool(False, help="a background load is in progress")
+
+    debounce = T.Float(
+        0.0, help="seconds to wait for further selection changes before describing"
+    )
+    cache_size = T.Int(
+        32, help="number of described selections and rendered diagrams to keep"
+    )
+    cache_triples = T.Int(
+        100_000, help="upper bound on the triples held by the kept diagrams"
+    )
+
+    _generation: int = 0
+    _epoch: int = 0
+    _pending: Optional[Future] = None
+    _loaded: Optional[Graph] = None
+    _preloaded: Optional[Graph] = None
+    _flush_handle: Optional[asyncio.Handle] = None
+
+    def __init__(self, *args, **kwargs):
+        # described, aggregated or empty subgraphs keyed by epoch, graph version
+        # and selection, least recent first
+        self._described: Dict[Tuple, Graph] = OrderedDict()
+        # rendered diagrams keyed by graph version and uris, least recent first
+        self._renders: Dict[Tuple, Render] = OrderedDict()
+        super().__init__(*args, **kwargs)
 
     @T.observe("active")
     def handler(self, change):
         super().handler(change)
         uris = []
         for el in change.new:
-            if isinstance(el, RDFElement):
+            aggregated = isinstance(self.subgraph, AggregateGraph)
+            if aggregated and isinstance(el, RDFAggregate):
+                # selecting a group expands it into its member terms
+                uris.extend(expand(self.subgraph, [el.metadata.uri]))
+            elif isinstance(el, RDFElement):
                 uri = el.metadata.uri
                 if isinstance(uri, (URIRef, BNode)):
                     uris.append(uri)
         if len(uris) == 0:
-            self.uris = None
+            uris = None
+        if self.debounce > 0:
+            self._schedule_uris(uris)
         else:
             self.uris = uris
 
-    @T.observe("uris", "graph")
+    def _schedule_uris(self, uris: Optional[List]):
+        """Coalesce rapid selection changes, only the last one within the
+        debounce window is described.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.uris = uris
+            return
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        self._flush_handle = loop.call_later(self.debounce, self._flush_uris, uris)
+
+    def _flush_uris(self, uris: Optional[List]):
+        self._flush_handle = None
+        self.uris = uris
+
+    @T.observe("uris", "graph", "depth", "node_budget", "group_by", "lazy")
     def _update_uris(self, change):
-        if self.uris is None:
-            self.subgraph = self.graph
+        if change is not None and change.name in ("graph", "depth", "node_budget"):
+            self._invalidate()
+        if self.threaded:
+            self._submit_load()
+        else:
+            self.subgraph = self._get_subgraph()
+
+    def _selection(self) -> Selection:
+        uris = None if self.uris is None else tuple(self.uris)
+        return Selection(
+            self._epoch,
+            self.graph,
+            uris,
+            self.lazy,
+            self.depth,
+            self.node_budget,
+            self.group_by,
+        )
+
+    def _get_subgraph(self) -> Graph:
+        return self._remember(*self._make_subgraph(self._selection()))
+
+    def _make_subgraph(self, selection: Selection) -> Tuple[Optional[Tuple], Graph]:
+        """Describe or aggregate the selection, reusing the subgraph made for it
+        while the graph version is unchanged, so the same graph object is handed
+        to `_render` again. The cache is only read, so this may run in a worker
+        thread; `_remember` keeps the subgraph back on the event loop.
+
+        :return: cache key of the selection, `None` for the whole graph, and the
+        subgraph
+        """
+        graph, uris = selection.graph, selection.uris
+        if uris is not None:
+            key = frozenset(uris)
+            make = partial(
+                describe,
+                graph,
+                list(uris),
+                depth=selection.depth,
+                max_triples=selection.node_budget,
+            )
+        elif selection.lazy:
+            # avoid walking a (persistent) graph until something is focused
+            key = ("lazy",)
+            make = partial(Graph, namespace_manager=graph.namespace_manager)
+        elif self._over_budget(graph, selection.node_budget):
+            key = ("aggregate", selection.group_by)
+            # the overview itself stays within the budget
+            make = partial(
+                aggregate,
+                graph,
+                by=selection.group_by,
+                max_groups=selection.node_budget,
+                max_edges=selection.node_budget,
+            )
         else:
-            self.subgraph = describe(self.graph, self.uris)
+            return None, graph
+        key = selection.epoch, graph_version(graph), key
+        subgraph = self._described.get(key)
+        if subgraph is None:
+            subgraph = make()
+        return key, subgraph
+
+    def _remember(self, key: Optional[Tuple], subgraph: Graph) -> Graph:
+        """Keep the subgraph made for the selection, unless the graph was
+        replaced or changed since the selection was read.
+        """
+        described = self._described
+        if key is None or key[0] != self._epoch:
+            return subgraph
+        described.setdefault(key, subgraph)
+        described.move_to_end(key)
+        while len(described) > max(self.cache_size, 0):
+            described.popitem(last=False)
+        return subgraph
+
+    def _submit_load(self):
+        """Describe the selection and work out the changes to its diagram in the
+        background, superseding any load still in flight. The partition and the
+        widgets are only updated back on the event loop.
+        """
+        self._generation += 1
+        if self._pending is not None:
+            self._pending.cancel()
+        self.loading = True
+        key = self._render_key()
+        cached = self._renders.get(key)
+        loader, loaded = self._free_loader(key, evict=False)
+        # a new loader draws the whole subgraph, which any loader can work out
+        loader = loader or self.loader
+        loader.predicate_mode = self.predicate_mode
+        self._pending = background.submit(
+            self._load_job,
+            self._generation,
+            self._selection(),
+            cached,
+            loader,
+            loaded,
+            callback=self._apply_job,
+        )
+
+    def _load_job(
+        self,
+        generation: int,
+        selection: Selection,
+        cached: Optional[Render],
+        loader: RDFLoader,
+        loaded: Optional[Graph],
+    ) -> Optional[Tuple[Optional[Tuple], Graph, Optional[LoadDiff]]]:
+        # runs in the worker thread, only reads the graphs and the partition
+        key, subgraph = self._make_subgraph(selection)
+        if generation != self._generation:
+            return None  # stale, leave the partition as is
+        if cached is not None and cached.subgraph is subgraph:
+            return key, subgraph, None  # already drawn
+        return key, subgraph, loader.diff(subgraph, loaded)
+
+    def _apply_job(self, future: Future):
+        if future is not self._pending:
+            return  # superseded by a later load
+        try:
+            job = future.result()
+            if job is not None:
+                key, subgraph, diff = job
+                self._remember(key, subgraph)
+                self._preloaded = subgraph
+                self.subgraph = subgraph
+                self.source = self._render(subgraph, diff)
+        except Exception:
+            background.report_error()
+        finally:
+            self._pending = None
+            self._preloaded = None
+            self.loading = False
+
+    def _over_budget(self, graph: Graph, node_budget: Optional[int]) -> bool:
+        if not node_budget:
+            return False
+        ends = get_distinct_ends(graph, match=(URIRef, BNode))
+        return next(islice(ends, node_budget, None), None) is not None
+
+    def notify_added(self, triples: Iterable[Tuple]):
+        """Update the diagram for triples added in place to `graph`, only
+        drawing the new triples when the whole graph is displayed.
+
+        :param triples: triples added to `graph`
+        """
+        triples = list(triples)
+        if not triples:
+            return
+        self._invalidate()
+        whole = self.subgraph is self.graph and self._pending is None
+        if whole and not self._over_budget(self.graph, self.node_budget):
+            self.source = source = self.loader.extend(triples, graph=self.graph)
+            render = Render(self.loader, self.graph, source, len(self.graph))
+            self._renders[self._render_key()] = render
+        else:
+            self._update_uris(None)
+
+    @T.observe("predicate_mode")
+    def _update_predicate_mode(self, change):
+        self._invalidate()
+        if self.threaded:
+            self._submit_load()
+        else:
+            self.source = self._render(self.subgraph)
 
     @T.observe("subgraph")
     def _update_source(self, change):
-        self.source = self.loader.load(change.new, change.old)
+        if change.new is self._preloaded:
+            # already loaded in the background
+            self._preloaded = None
+            return
+        self.source = self._render(change.new)
+
+    def _invalidate(self):
+        """Forget described selections and rendered diagrams of the previous
+        graph. The current loader is kept to apply the next change as a delta.
+        """
+        self._epoch += 1
+        self._described.clear()
+        self._renders.clear()
+
+    def _render_key(self) -> Tuple:
+        uris = None if self.uris is None else frozenset(self.uris)
+        return self._epoch, graph_version(self.graph), uris
+
+    def refresh(self):
+        """Redraw if the graph was changed in place since it was last rendered.
+        Only graphs tracking their version (`VersionedGraph`) are detected.
+        """
+        if self._render_key() in self._renders:
+            return
+        subgraph = self._get_subgraph()
+        if subgraph is self.subgraph:
+            self.source = self._render(subgraph)
+        else:
+            self.subgraph = subgraph
+
+    def _render(self, subgraph: Graph, diff: LoadDiff = None) -> MarkElementWidget:
+        """Get the diagram of the subgraph, reusing the one rendered for the same
+        selection if it is still cached.
+
+        :param subgraph: graph to draw
+        :param diff: changes worked out in the background, see `_submit_load`
+        """
+        key = self._render_key()
+        renders = self._renders
+        cached = renders.get(key)
+        if cached is not None and cached.subgraph is subgraph:
+            renders.move_to_end(key)
+            self.loader, self._loaded = cached.loader, subgraph
+            return cached.source
+
+        loader, loaded = self._free_loader(key)
+        loader.predicate_mode = self.predicate_mode
+        source = loader.load(subgraph, loaded, diff)
+        renders[key] = Render(loader, subgraph, source, len(subgraph))
+        self.loader, self._loaded = loader, subgraph
+        self._trim_renders()
+        return source
+
+    def _free_loader(
+        self, key: Tuple, evict: bool = True
+    ) -> Tuple[Optional[RDFLoader], Optional[Graph]]:
+        """Pick a loader for a new render with the graph it currently shows.
+
+        With `evict` false the renders are left as they are and `None` stands
+        for the new loader that would be made, to work out the changes ahead.
+        """
+        renders = self._renders
+        # rendered from a previous graph or graph version
+        outdated = [k for k in renders if k[:2] != key[:2]]
+        stale = renders.get(key)
+        kept = [k for k in renders if k[:2] == key[:2] and k != key]
+        if evict:
+            for k in outdated:
+                del renders[k]
+            renders.pop(key, None)
+        if stale is not None:
+            return stale.loader, stale.subgraph
+        if all(renders[k].loader is not self.loader for k in kept):
+            # not cached, update the current partition with a delta
+            return self.loader, self._loaded
+        if len(kept) < self.cache_size:
+            if not evict:
+                return None, None
+            return type(self.loader)(), None
+        render = renders[kept[0]]
+        if evict:
+            del renders[kept[0]]
+        return render.loader, render.subgraph
+
+    def _trim_renders(self):
+        renders = self._renders
+        while len(renders) > 1 and (
+            len(renders) > self.cache_size
+            or sum(render.size for render in renders.values()) > self.cache_triples
+        ):
+            renders.popitem(last=False)
+
+    @T.observe("loading", "diagram")
+    def _update_loading(self, change):
+        if self.diagram:
+            if self.loading:
+                self.diagram.add_class("ipyrdf-loading")
+            else:
+                self.diagram.remove_class("ipyrdf-loading")
 
     @T.observe("source", "diagram")
     def _update_output(self, change):
@@ -1,4 +1,5 @@
-from typing import Type, Union
+import textwrap
+from typing import Dict, Iterable, List, Optional, Tuple, Type, Union
 
 from ipyelk import exceptions
 from ipyelk.contrib.molds import connectors
@@ -13,12 +14,13 @@ from ipyelk.elements import (  # Compartment,; Mark,; Record,; layout_options as
     SymbolSpec,
     merge_excluded,
 )
-from pydantic import Field
+from pydantic import Field, PrivateAttr, validator
 
 # from ipyelk.elements.shape import Shape, shapes, Symbol
-from rdflib.term import BNode, Literal, URIRef, Variable
+from rdflib.term import BNode, Literal, URIRef
 
 from ..namespace_wrapper import NSWrapper
+from ..terms import IdTriple, TermDictionary
 
 RDF_DIAGRAM_STYLE = {
     " .rdf-uriref > .elknode": {
@@ -38,6 +40,13 @@ RDF_DIAGRAM_STYLE = {
     " .rdf-predicate > .elknode": {
         "stroke": "var(--jp-mirror-editor-atom-color)",
     },
+    " .elklabel.rdf-property": {
+        "font-style": "italic",
+    },
+    " .rdf-aggregate > .elknode": {
+        "stroke": "var(--jp-mirror-editor-variable-2-color)",
+        "stroke-dasharray": "4 2",
+    },
     " .rdf-expression  > .elknode": {
         "stroke": "var(--jp-mirror-editor-builtin-color)",
         "rx": "10px",
@@ -83,26 +92,371 @@ class RDFPredicate(RDFElement):
     )
 
 
+class RDFAggregate(RDFElement):
+    properties: NodeProperties = Field(
+        default_factory=lambda *_: NodeProperties(cssClasses="rdf-aggregate")
+    )
+
+
+PREDICATE_MODES = ("edges", "namespaced", "nested")
+
+
 class RDFPartition(Partition):
     ns: NSWrapper = Field(default_factory=NSWrapper)
     default_edge: Type[Edge] = Field(default=SimplePredicate)
+    aggregates: Dict = Field(
+        default_factory=dict, description="number of terms behind aggregate nodes"
+    )
+    terms: TermDictionary = Field(
+        default_factory=TermDictionary, description="ids of the drawn terms"
+    )
+    predicate_mode: str = Field(
+        default="edges",
+        description=(
+            "`edges` draws an edge per triple, `namespaced` bundles the parallel "
+            "predicates of a namespace into one edge, `nested` bundles all "
+            "parallel predicates and folds literal values into their subject"
+        ),
+    )
+    # child nodes and edges by the ids of their key and triple
+    _nodes: Dict[int, Node] = PrivateAttr(default_factory=dict)
+    # position of each child in `children` by the child's id, so removing a
+    # child does not scan the list
+    _positions: Dict[int, int] = PrivateAttr(default_factory=dict)
+    _triple_edges: Dict[IdTriple, Edge] = PrivateAttr(default_factory=dict)
+    # predicate labels of the triples drawn by each bundled edge
+    _bundles: Dict[Tuple, Dict[IdTriple, str]] = PrivateAttr(default_factory=dict)
+    _bundle_edges: Dict[Tuple, Edge] = PrivateAttr(default_factory=dict)
+    _triple_bundles: Dict[IdTriple, Tuple] = PrivateAttr(default_factory=dict)
+    # labels of literal values folded into their subject node
+    _folded: Dict[IdTriple, Label] = PrivateAttr(default_factory=dict)
 
     class Config:
         copy_on_model_validation = False
-        excluded = merge_excluded(Partition, "ns", "default_edge")
+        excluded = merge_excluded(
+            Partition, "ns", "default_edge", "aggregates", "terms", "predicate_mode"
+        )
 
         # class Config:
         arbitrary_types_allowed = True
 
-    def add_triple(self, s, p, o):
-        # check predicate mode ["edges", "nested", "namespaced", "nodes"]
+    @validator("predicate_mode")
+    def _check_predicate_mode(cls, mode):
+        if mode not in PREDICATE_MODES:
+            raise ValueError(f"predicate_mode must be one of {PREDICATE_MODES}")
+        return mode
+
+    def add_triple(self, s, p, o) -> Optional[Edge]:
+        """Draw the triple, `None` is returned for a folded literal value"""
+        _id = self.terms.id
+        triple = (_id(s), _id(p), _id(o))
+        if triple in self._triple_edges:
+            return self._triple_edges[triple]
+        if triple in self._folded:
+            return None
 
         source = self._get_child(s)
+        text = rdf_label(self.ns, p)
+        if self._folds(o):
+            self._fold(source, triple, text, rdf_label(self.ns, o))
+            return None
         target = self._get_child(o)
 
-        edge = self[source : target : rdf_label(self.ns, p)]
-        edge.add_class("rdf-predicate")
-        edge.metadata = RDFMetadata(uri=p)
+        key = self._bundle_key(triple, text)
+        if key in self._bundles:
+            edge = self._bundle_edges[key]
+            self._add_to_bundle(key, triple, text)
+            self._relabel_bundles([key])
+        else:
+            edge = self[source : target : text]
+            edge.add_class("rdf-predicate")
+            edge.metadata = RDFMetadata(uri=p)
+            if key is not None:
+                self._bundle_edges[key] = edge
+                self._add_to_bundle(key, triple, text)
+        self._triple_edges[triple] = edge
+        return edge
+
+    def drawn_size(self) -> int:
+        """Upper bound on the number of distinct terms drawn: the nodes and a
+        predicate and folded value per drawn triple
+        """
+        return len(self._nodes) + len(self._triple_edges) + len(self._folded)
+
+    def add_triples(self, triples: Iterable[Tuple]):
+        """Bulk version of `add_triple`.
+
+        The new nodes and edges are first collected column wise (term, class
+        code and label per node; source, target and predicate per edge) and
+        then materialised in one go without re-running pydantic validation on
+        every element. Terms are looked up by their id in the term dictionary.
+
+        :param triples: triples to draw
+        """
+        _id = self.terms.id
+        index = self._nodes
+        triple_edges = self._triple_edges
+        folded = self._folded
+
+        # columns of the nodes to create
+        terms: List = []
+        term_ids: List[int] = []
+        positions: Dict[int, int] = {}
+        # columns of the edges to create, ends are either nodes or node positions
+        sources: List = []
+        targets: List = []
+        predicates: List = []
+        edge_triples: List[Tuple] = []
+        # columns of the literal values to fold into their subject
+        fold_subjects: List = []
+        fold_values: List[Tuple] = []
+
+        def end(term, term_id):
+            node = index.get(term_id)
+            if node is not None:
+                return node
+            position = positions.get(term_id)
+            if position is None:
+                position = positions[term_id] = len(terms)
+                terms.append(term)
+                term_ids.append(term_id)
+            return position
+
+        for s, p, o in triples:
+            triple = s_id, _, o_id = (_id(s), _id(p), _id(o))
+            if triple in triple_edges or triple in folded:
+                continue
+            if self._folds(o):
+                folded[triple] = None  # placeholder, also de-duplicates
+                fold_subjects.append(end(s, s_id))
+                fold_values.append((p, o, triple))
+                continue
+            triple_edges[triple] = None  # placeholder, also de-duplicates
+            sources.append(end(s, s_id))
+            targets.append(end(o, o_id))
+            predicates.append(p)
+            edge_triples.append(triple)
+
+        labels = self.ns.labels_for(
+            [*terms, *predicates, *(t for value in fold_values for t in value[:2])]
+        )
+        nodes = [self._make_node(term, labels[term]) for term in terms]
+        index.update(zip(term_ids, nodes))
+        start = len(self.children)
+        self.children.extend(nodes)
+        self._positions.update((id(node), start + i) for i, node in enumerate(nodes))
+
+        for subject, (p, o, triple) in zip(fold_subjects, fold_values):
+            node = nodes[subject] if isinstance(subject, int) else subject
+            self._fold(node, triple, labels[p], labels[o])
+
+        edge_cls = self.default_edge
+        edge_properties = edge_cls.__fields__["properties"].get_default()
+        edge_properties = edge_properties.copy(
+            update={"cssClasses": "rdf-predicate"}
+        )
+        edge_shape = edge_properties.shape
+        bundles = self._bundles
+        touched = set()
+        edges = []
+        for source, target, p, triple in zip(
+            sources, targets, predicates, edge_triples
+        ):
+            key = self._bundle_key(triple, labels[p])
+            if key in bundles:
+                touched.add(key)
+                self._add_to_bundle(key, triple, labels[p])
+                triple_edges[triple] = self._bundle_edges[key]
+                continue
+            edge = edge_cls.construct(
+                source=nodes[source] if isinstance(source, int) else source,
+                target=nodes[target] if isinstance(target, int) else target,
+                labels=[Label.construct(text=labels[p])],
+                metadata=RDFMetadata.construct(uri=p),
+                # properties and shape are flat, a shallow copy of each is
+                # enough to keep edges independent and much cheaper than deep
+                properties=edge_properties.copy(
+                    update={"shape": edge_shape and edge_shape.copy()}
+                ),
+            )
+            if key is not None:
+                self._bundle_edges[key] = edge
+                self._add_to_bundle(key, triple, labels[p])
+            triple_edges[triple] = edge
+            edges.append(edge)
+        self.edges.extend(edges)
+        self._relabel_bundles(touched)
+
+    def _folds(self, term) -> bool:
+        """Test if the term is drawn inside its subject instead of as a node"""
+        return self.predicate_mode == "nested" and isinstance(term, Literal)
+
+    def _fold(self, node: Node, triple: IdTriple, predicate: str, value: str):
+        label = Label.construct(text=textwrap.shorten(f"{predicate} = {value}", 70))
+        label.add_class("rdf-property")
+        node.labels.append(label)
+        self._folded[triple] = label
+
+    def _bundle_key(self, triple: IdTriple, predicate: str) -> Optional[Tuple]:
+        """Key of the edge drawing the triple together with its parallel triples,
+        `None` when each triple gets its own edge
+        """
+        s_id, _, o_id = triple
+        if self.predicate_mode == "namespaced":
+            prefix, sep, _ = predicate.partition(":")
+            return s_id, o_id, prefix if sep else predicate
+        if self.predicate_mode == "nested":
+            return s_id, o_id
+        return None
+
+    def _add_to_bundle(self, key: Tuple, triple: IdTriple, predicate: str):
+        self._bundles.setdefault(key, {})[triple] = predicate
+        self._triple_bundles[triple] = key
+
+    def _relabel_bundles(self, keys: Iterable[Tuple]):
+        """Label bundled edges with their predicate, or a count of predicates"""
+        for key in keys:
+            predicates = self._bundles.get(key)
+            if not predicates:
+                continue
+            if len(predicates) == 1:
+                (text,) = predicates.values()
+            elif self.predicate_mode == "namespaced":
+                text = f"{key[2]}: ({len(predicates)})"
+            else:
+                text = f"{len(predicates)} predicates"
+            self._bundle_edges[key].labels[0].text = text
+
+    def update_aggregates(self, counts: Dict):
+        """Set the number of terms behind the aggregate nodes, relabelling the
+        drawn aggregate nodes whose count changed
+
+        :param counts: number of terms by aggregate node key
+        """
+        previous, self.aggregates = self.aggregates, counts
+        changed = [
+            key for key, count in counts.items() if previous.get(key, count) != count
+        ]
+        if not changed:
+            return
+        folded = {id(label) for label in self._folded.values()}
+        for key in changed:
+            node = self._nodes.get(self.terms.id(key)) if key in self.terms else None
+            if node is None:
+                continue
+            text = f"{rdf_label(self.ns, key)} ({counts[key]})"
+            node.labels[:] = [
+                *(Label.construct(text=line) for line in textwrap.wrap(text)),
+                *(label for label in node.labels if id(label) in folded),
+            ]
+
+    def _make_node(self, term, text: str) -> RDFElement:
+        """Materialise a child node without pydantic validation"""
+        _cls = RDFElement
+        if isinstance(term, Literal):
+            _cls = RDFLiteralBinding
+        if isinstance(term, URIRef):
+            _cls = RDFURIRef
+        if term in self.aggregates:
+            _cls = RDFAggregate
+            text = f"{text} ({self.aggregates[term]})"
+        node = _cls.construct(
+            labels=[Label.construct(text=line) for line in textwrap.wrap(text)],
+            metadata=RDFMetadata.construct(uri=term),
+        )
+        node.properties.key = term
+        return node.set_parent(self)
+
+    def remove_triples(self, triples: Iterable[Tuple]):
+        """Remove the edges drawn for the given triples. Nodes are left in place.
+
+        Bundled edges are only removed with the last of their triples, folded
+        literal values are dropped from their subject.
+
+        :param triples: triples previously added with `add_triple`
+        """
+        removed = set()
+        touched = set()
+        for triple in self.terms.encode(triples):
+            label = self._folded.pop(triple, None)
+            if label is not None:
+                node = self._nodes.get(triple[0])
+                if node is not None:
+                    node.labels[:] = [x for x in node.labels if x is not label]
+                continue
+            edge = self._triple_edges.pop(triple, None)
+            if edge is None:
+                continue
+            key = self._triple_bundles.pop(triple, None)
+            if key is not None:
+                predicates = self._bundles[key]
+                del predicates[triple]
+                if predicates:
+                    touched.add(key)
+                    continue
+                del self._bundles[key]
+                del self._bundle_edges[key]
+            removed.add(edge)
+        self._relabel_bundles(touched)
+        if removed:
+            # mutate in place to avoid revalidating the whole edge list
+            self.edges[:] = [edge for edge in self.edges if edge not in removed]
+
+    def remove_terms(self, terms: Iterable):
+        """Remove the child nodes keyed by the given terms
+
+        :param terms: rdf terms used as child keys
+        """
+        _id = self.terms.id
+        index = self._nodes
+        removed = {index.pop(_id(term), None) for term in terms}
+        removed.discard(None)
+        if not removed:
+            return
+        for child in removed:
+            child.set_parent()
+        self.children[:] = [c for c in self.children if c not in removed]
+        self._positions = {id(c): i for i, c in enumerate(self.children)}
+
+    def add_child(self, child: Node, key=None) -> Node:
+        super().add_child(child, key)
+        self._positions[id(child)] = len(self.children) - 1
+        if key is not None:
+            self._nodes[self.terms.id(key)] = child
+        return child
+
+    def get_child(self, key) -> Node:
+        """Find the child added with `key` from the hash index of the children
+
+        :raises NotFoundError: If no child was added with the key
+        """
+        node = self._nodes.get(self.terms.id(key))
+        if node is None:
+            raise exceptions.NotFoundError("Child not found")
+        return node
+
+    def remove_child(self, child: Node) -> Node:
+        """Remove the child in constant time, the last child takes its place"""
+        key = child.properties.key
+        if key is not None and key in self.terms:
+            key_id = self.terms.id(key)
+            if self._nodes.get(key_id) is child:
+                del self._nodes[key_id]
+        children = self.children
+        position = self._positions.pop(id(child), None)
+        if (
+            position is None
+            or position >= len(children)
+            or children[position] is not child
+        ):
+            # `children` was changed directly, fall back to scanning it
+            return super().remove_child(child)
+        # move the last child into the freed slot instead of shifting the rest
+        last = children.pop()
+        if last is not child:
+            children[position] = last
+            self._positions[id(last)] = position
+        return child.set_parent()
 
     def _get_child(self, term, key=None, parent=None):
         if parent is None:
@@ -110,12 +464,18 @@ class RDFPartition(Partition):
         if key is None:
             key = term
 
-        try:
-            return parent.get_child(key)
-        except exceptions.NotFoundError:
-            pass
-        if key in parent.children:
-            return parent.children[key]
+        if isinstance(parent, RDFPartition):
+            node = parent._nodes.get(parent.terms.id(key))
+            if node is not None:
+                return node
+        else:
+            try:
+                return parent.get_child(key)
+            except exceptions.NotFoundError:
+                pass
+        return parent.add_child(self._new_node(term, key), key)
+
+    def _new_node(self, term, key) -> RDFElement:
         # test type of key: [uri, variable, literal]
         _cls = RDFElement
         text = rdf_label(self.ns, term)
@@ -123,24 +483,25 @@ class RDFPartition(Partition):
             _cls = RDFLiteralBinding
         if isinstance(term, URIRef):
             _cls = RDFURIRef
+        if key in self.aggregates:
+            _cls = RDFAggregate
+            text = f"{text} ({self.aggregates[key]})"
 
-        node = _cls(labels=[*Label(text=text).wrap()], metadata=RDFMetadata(uri=key))
-        return parent.add_child(node, key)
+        return _cls(labels=[*Label(text=text).wrap()], metadata=RDFMetadata(uri=key))
 
     def clear(self):
-        # self._child_namespace = dict()
-        # self.children = []
-        # self.ports = {}
-        self.edges = list()
+        for child in self.children:
+            child.set_parent()
+        self.children[:] = []
+        self.edges[:] = []
+        self._nodes.clear()
+        self._positions.clear()
+        self._triple_edges.clear()
+        self._bundles.clear()
+        self._bundle_edges.clear()
+        self._triple_bundles.clear()
+        self._folded.clear()
 
 
 def rdf_label(ns: NSWrapper, term) -> str:
-    if isinstance(term, URIRef):
-        text = ns[term]  # get the qname from the namespace manager
-    elif isinstance(term, Variable):
-        text = "?" + str(term)
-    elif isinstance(term, Literal):
-        text = term.n3(ns._graph.namespace_manager)
-    else:
-        text = str(term)
-    return text
+    return ns.label(term)
@@ -1,4 +1,4 @@
-from typing import List, Optional, Set, Tuple
+from typing import Iterable, List, NamedTuple, Optional, Set, Tuple
 
 import traitlets as T
 from ipyelk import Diagram, ElementLoader, MarkElementWidget
@@ -6,12 +6,51 @@ from ipyelk.elements import layout_options as opt
 from ipyrdf import NSWrapper
 from rdflib import Graph
 
-from ..queries.summary import get_distinct_ends
-from .rdf_diagram import RDF_DIAGRAM_STYLE, RDF_DIAGRAM_SYMBOLS, RDFPartition
+from ..queries.lifecycle import GraphDelta, changes_delta, graph_delta
+from ..stores import open_graph
+from ..terms import TermDictionary
+from ..versioning import VersionedGraph, graph_version
+from .rdf_diagram import (
+    PREDICATE_MODES,
+    RDF_DIAGRAM_STYLE,
+    RDF_DIAGRAM_SYMBOLS,
+    RDFPartition,
+)
+
+# the partition is rebuilt once the term dictionary outgrows the drawn terms
+TERMS_GROWTH = 2
+TERMS_SLACK = 10_000
+
+
+class LoadDiff(NamedTuple):
+    """Changes to draw a graph, worked out by `RDFLoader.diff`"""
+
+    loader: "RDFLoader"
+    old_graph: Optional[Graph]
+    # state of the loader the changes were worked out for
+    loads: int
+    predicate_mode: str
+    version: Optional[int]
+    rebuild: bool
+    delta: GraphDelta
 
 
 class RDFLoader(ElementLoader):
-    partition: RDFPartition = T.Instance(RDFPartition, kw={})
+    partition: RDFPartition = T.Instance(RDFPartition)
+    terms: TermDictionary = T.Instance(TermDictionary, args=())
+    predicate_mode = T.Enum(
+        PREDICATE_MODES, default_value="edges", help="how predicates are drawn"
+    )
+
+    # version of the loaded graph if it is a `VersionedGraph`
+    _version: Optional[int] = None
+    # number of deltas applied to the partition
+    _loads: int = 0
+
+    @T.default("partition")
+    def _default_partition(self):
+        # term ids are kept by the loader so they survive rebuilding partitions
+        return RDFPartition(terms=self.terms, predicate_mode=self.predicate_mode)
 
     @T.default("default_label_opts")
     def _default_node_opts(self):
@@ -28,38 +67,114 @@ class RDFLoader(ElementLoader):
             opt.Direction.identifier: opt.Direction(value="DOWN").value,
         }
 
-    def load(self, new_graph: Graph, old_graph: Graph = None) -> MarkElementWidget:
-        partition = self.partition
-        partition.ns = NSWrapper(graph=new_graph)
-        partition.clear()
-        exiting_uri, exiting_triples, entering_triples = graph_lifecycle(
-            old_graph, new_graph
+    def diff(self, new_graph: Graph, old_graph: Graph = None) -> LoadDiff:
+        """Work out the changes between the previously loaded graph and the new
+        graph. Neither the partition nor any widget is touched, so this may run
+        in a worker thread.
+
+        :param new_graph: graph to display
+        :param old_graph: graph currently displayed by the partition, if `None`
+        the partition is rebuilt from scratch
+        :return: the delta to apply and whether the partition is rebuilt first
+        """
+        version = graph_version(new_graph)
+        # aggregate and plain graphs draw the same terms differently
+        rebuild = (
+            old_graph is None
+            or type(old_graph) is not type(new_graph)
+            or self.partition.predicate_mode != self.predicate_mode
+            or self._terms_outgrown()
+        )
+        changes = None
+        if not rebuild and old_graph is new_graph and self._version is not None:
+            # changed in place, replay the changelog since the last load
+            changes = new_graph.changes_since(self._version)
+            rebuild = changes is None
+        if rebuild:
+            delta = graph_lifecycle(None, new_graph)
+        elif changes is None:
+            delta = graph_lifecycle(old_graph, new_graph)
+        else:
+            delta = changes_delta(new_graph, *changes)
+        return LoadDiff(
+            self, old_graph, self._loads, self.predicate_mode, version, rebuild, delta
         )
-        for uri in exiting_uri:
-            partition.remove_child(partition._get_child(uri))
 
-        # TODO handle the exiting and entering triples
-        for s, p, o in new_graph:
-            partition.add_triple(s, p, o)
+    def load(
+        self, new_graph: Graph, old_graph: Graph = None, diff: LoadDiff = None
+    ) -> MarkElementWidget:
+        """Update the partition with the difference between the previously
+        loaded graph and the new graph. Only the exiting triples are removed and
+        the entering triples added so existing nodes are reused.
+
+        :param new_graph: graph to display
+        :param old_graph: graph currently displayed by the partition, if `None`
+        the partition is rebuilt from scratch
+        :param diff: changes worked out beforehand by `diff`, e.g. in a worker
+        thread, they are worked out again if the partition changed since
+        :return: element widget wrapping the partition
+        """
+        if diff is None or not self._applies(diff, old_graph):
+            diff = self.diff(new_graph, old_graph)
+        partition = self.partition
+        if partition.ns._graph.namespace_manager is not new_graph.namespace_manager:
+            # keep the cached labels while the namespace manager is shared
+            partition.ns = NSWrapper(graph=new_graph)
+        if partition.predicate_mode != self.predicate_mode:
+            partition.predicate_mode = self.predicate_mode
+        if diff.rebuild:
+            partition.clear()
+            # no id is in use any more, let go of the terms of previous graphs
+            self.terms = partition.terms = TermDictionary()
+        partition.update_aggregates(getattr(new_graph, "counts", {}))
+        self._version = diff.version
+        return self.apply_delta(diff.delta)
+
+    def _terms_outgrown(self) -> bool:
+        """Test if most of the interned terms are no longer drawn, the ids of
+        exiting terms are only released by rebuilding the partition
+        """
+        drawn = self.partition.drawn_size()
+        return len(self.terms) > TERMS_GROWTH * drawn + TERMS_SLACK
+
+    def _applies(self, diff: LoadDiff, old_graph: Optional[Graph]) -> bool:
+        if diff.predicate_mode != self.predicate_mode:
+            return False
+        if diff.rebuild:
+            # any partition is cleared before drawing the whole graph
+            return True
+        return (
+            diff.loader is self
+            and diff.old_graph is old_graph
+            and diff.loads == self._loads
+        )
 
-        return super().load(root=self.partition)
+    def extend(
+        self, triples: Iterable[Tuple], graph: Graph = None
+    ) -> MarkElementWidget:
+        """Draw triples that were added in place to the loaded graph
+
+        :param triples: added triples
+        :param graph: loaded graph, to record its version
+        :return: element widget wrapping the partition
+        """
+        if graph is not None:
+            self._version = graph_version(graph)
+        return self.apply_delta(GraphDelta(set(), set(), set(), set(triples)))
+
+    def apply_delta(self, delta: GraphDelta) -> MarkElementWidget:
+        self._loads += 1
+        partition = self.partition
+        partition.remove_triples(delta.exiting_triples)
+        partition.remove_terms(delta.exiting_terms)
 
+        partition.add_triples(delta.entering_triples)
 
-def graph_lifecycle(old: Graph, new: Graph):
-    if not isinstance(old, Graph):
-        old = Graph()
-    if not isinstance(new, Graph):
-        new = Graph()
-    old_uri = set(get_distinct_ends(old))
-    new_uri = set(get_distinct_ends(new))
-    exiting_uri = old_uri.difference(new_uri)
+        return super().load(root=self.partition)
 
-    exiting_triples, entering_triples = lifecycle(
-        old=set(t for t in old),
-        new=set(t for t in new),
-    )
 
-    return exiting_uri, exiting_triples, entering_triples
+def graph_lifecycle(old: Graph, new: Graph) -> GraphDelta:
+    return graph_delta(old, new)
 
 
 def lifecycle(old: Set, new: Set) -> Tuple[Set, Set]:
@@ -68,15 +183,33 @@ def lifecycle(old: Set, new: Set) -> Tuple[Set, Set]:
     return exiting, entering
 
 
-def from_rdf(graph: Graph = None, uris: Optional[List[str]] = None, **kwargs):
+def from_rdf(
+    graph: Graph = None,
+    uris: Optional[List[str]] = None,
+    store: str = None,
+    lazy: bool = None,
+    **kwargs,
+):
+    """Make a diagram of the graph with a DescribeTool
+
+    :param graph: graph to display, defaults to None
+    :param uris: initially focused uris, defaults to None
+    :param store: `<plugin>:<configuration>` spec of a persistent store to open
+    when no graph is given
+    :param lazy: only pull the described triples from the graph, defaults to
+    `True` for persistent stores
+    """
     from .describe_tool import DescribeTool
 
     if graph is None:
-        graph = Graph()
+        graph = open_graph(store) if store else VersionedGraph()
+    if lazy is None:
+        lazy = store is not None
 
     return Diagram(style=RDF_DIAGRAM_STYLE, symbols=RDF_DIAGRAM_SYMBOLS,).register_tool(
         DescribeTool(
             graph=graph,
             uris=uris,
+            lazy=lazy,
         )
     )
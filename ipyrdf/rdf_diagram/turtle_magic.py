@@ -1,10 +1,15 @@
 import argparse
+from typing import List, Optional, Tuple
 
 from IPython.core.magic import needs_local_scope, register_cell_magic
+from ipyelk import Diagram
 from rdflib import Graph
 
 
+from .. import background
+from ..stores import open_graph, parse_store_spec
 from ..util import get_variable, set_variable
+from ..versioning import VersionedGraph
 from .describe_tool import DescribeTool
 from .rdf_loader import from_rdf
 
@@ -30,11 +35,21 @@ parser.add_argument(
 )
 parser.add_argument(
     "--store",
-    help="specify store for the graph",
+    help=(
+        "specify store for the graph, either a variable holding a store or a "
+        "`<plugin>:<configuration>` spec of a persistent store, e.g. "
+        "`BerkeleyDB:/path/to/db`"
+    ),
     type=str,
     default=None,
 )
 
+parser.add_argument(
+    "--background",
+    help="parse the cell in a worker thread and update the diagram when done",
+    action="store_true",
+)
+
 parser.add_argument(
     "--uris",
     nargs="*",
@@ -51,6 +66,48 @@ def get_prefix_string(graph: Graph):
     return prefixes
 
 
+def append_turtle(graph: Graph, cell: str) -> List[Tuple]:
+    """Parse turtle into an existing graph
+
+    The cell is parsed into a scratch graph so only the cell's triples are
+    compared against the existing ones.
+
+    :param graph: graph to extend in place
+    :param cell: turtle to parse
+    :return: triples that were not already in the graph
+    """
+    return merge_parsed(graph, parse_turtle(cell))
+
+
+def parse_turtle(cell: str) -> Graph:
+    """Parse turtle into a new scratch graph, safe to run in a worker thread"""
+    parsed = Graph()
+    parsed.parse(data=cell, format="turtle")
+    return parsed
+
+
+def merge_parsed(graph: Graph, parsed: Graph) -> List[Tuple]:
+    """Add the prefixes and triples of a scratch graph missing from `graph`
+
+    :return: the added triples
+    """
+    known = {prefix for prefix, _ in graph.namespaces()}
+    for prefix, namespace in parsed.namespaces():
+        if prefix not in known:
+            graph.bind(prefix, namespace, override=False)
+    return add_missing(graph, parsed)
+
+
+def add_missing(graph: Graph, other: Graph) -> List[Tuple]:
+    """Add the triples of `other` that are missing from `graph`
+
+    :return: the added triples
+    """
+    added = [triple for triple in other if triple not in graph]
+    graph.addN((s, p, o, graph) for s, p, o in added)
+    return added
+
+
 @register_cell_magic
 @needs_local_scope
 def turtle(parameters: str, cell: str, local_ns: dict = None):
@@ -66,31 +123,106 @@ def turtle(parameters: str, cell: str, local_ns: dict = None):
     :param local_ns: calling scopes local namespace, defaults to None
     """
     args = parser.parse_args(parameters.strip().split(" "))
-    varname = args.varname
-    store = get_variable(args.store, local_ns) if args.store else "default"
-    graph = Graph(store=store, identifier=args.id)
+    persistent = bool(args.store) and parse_store_spec(args.store) is not None
+
+    if not args.background:
+        value, added = parse_cell(args, cell, local_ns)
+        return publish(args, value, added, local_ns, persistent)
 
-    if args.append and "@prefix" not in cell:
-        var = get_variable(varname, local_ns)
+    def on_parsed(future):
+        try:
+            value, added = merge_cell(args, future.result(), local_ns)
+            publish(args, value, added, local_ns, persistent, diagram=diagram)
+        except Exception:
+            # publish resets `loading` itself, unless it failed on the way
+            if tool is not None:
+                tool.loading = False
+            background.report_error()
+
+    diagram = None
+    tool = None
+    if args.varname:
+        var = get_variable(args.varname, local_ns)
         if isinstance(var, DescribeTool):
-            graph = var.graph
-        elif isinstance(var, Graph):
-            graph = var
-        cell = "\n".join(get_prefix_string(graph)) + cell
+            tool = var
+    else:
+        # show the diagram right away, it is filled in once the cell is parsed
+        diagram = from_rdf(graph=Graph(), uris=[], lazy=persistent)
+        tool = get_describe_tool(diagram)
+    if tool is not None:
+        tool.loading = True
+    # only the parsing runs in the worker, the parsed cell is merged into any
+    # existing graph back on the event loop
+    background.submit(read_cell, args, cell, local_ns, callback=on_parsed)
+    return diagram
+
+
+def parse_cell(args, cell: str, local_ns: dict) -> Tuple[Graph, Optional[List]]:
+    """Parse the cell according to the magic arguments
+
+    :return: resulting graph and, when appending, the triples that were added
+    """
+    return merge_cell(args, read_cell(args, cell, local_ns), local_ns)
+
+
+def read_cell(args, cell: str, local_ns: dict) -> Graph:
+    """Parse the cell without changing any existing graph
+
+    :return: scratch graph of the cell when appending, else the new graph
+    """
+    if args.append:
+        assert args.varname, "Varname must exist"
+        graph = get_graph(args.varname, local_ns)
+        if "@prefix" not in cell:
+            cell = "\n".join(get_prefix_string(graph)) + cell
+        return parse_turtle(cell)
+
+    if args.store and parse_store_spec(args.store) is not None:
+        graph = open_graph(args.store, identifier=args.id)
+    else:
+        store = get_variable(args.store, local_ns) if args.store else "default"
+        graph = VersionedGraph(store=store, identifier=args.id)
 
     value = graph.parse(data=cell, format="turtle")
 
     if args.base:
-        base = get_variable(args.base, local_ns)
-        value = value + base
+        # extend the parsed graph rather than copying both into a new one
+        value += get_variable(args.base, local_ns)
+    return value
 
-    if args.append:
-        assert varname, "Varname must exist"
-        base = get_variable(varname, local_ns)
-        if isinstance(base, DescribeTool):
-            base = base.graph
-        value = value + base
 
+def merge_cell(args, parsed: Graph, local_ns: dict) -> Tuple[Graph, Optional[List]]:
+    """Add the cell parsed by `read_cell` to the existing graph when appending
+
+    :return: resulting graph and, when appending, the triples that were added
+    """
+    if not args.append:
+        return parsed, None
+    # extend in place instead of copying the existing graph
+    graph = get_graph(args.varname, local_ns)
+    added = merge_parsed(graph, parsed)
+    if args.base:
+        added += add_missing(graph, get_variable(args.base, local_ns))
+    return graph, added
+
+
+def get_graph(varname: str, local_ns: dict) -> Graph:
+    var = get_variable(varname, local_ns)
+    return var.graph if isinstance(var, DescribeTool) else var
+
+
+def publish(
+    args,
+    value: Graph,
+    added: Optional[List],
+    local_ns: dict,
+    persistent: bool,
+    diagram: Diagram = None,
+):
+    """Store the parsed graph in the variable, update its DescribeTool or make
+    a new diagram
+    """
+    varname = args.varname
     set_uri = False
     if isinstance(args.uris, list):
         set_uri = True
@@ -104,14 +236,30 @@ def turtle(parameters: str, cell: str, local_ns: dict = None):
         # update existing diagram
         var: DescribeTool = get_variable(varname, local_ns)
         if isinstance(var, DescribeTool):
+            var.loading = False
             if set_uri:
                 var.uris = uris
-            var.graph = value
+            if added is not None and var.graph is value:
+                var.notify_added(added)
+            else:
+                var.graph = value
         else:
             set_variable(varname, value, local_ns)
+    elif diagram is not None:
+        # fill in the diagram made while parsing in the background
+        tool = get_describe_tool(diagram)
+        tool.loading = False
+        with tool.hold_trait_notifications():
+            tool.uris = uris
+            tool.graph = value
     else:
         # make new diagram
         return from_rdf(
-            graph=graph,
+            graph=value,
             uris=uris,
+            lazy=persistent,
         )
+
+
+def get_describe_tool(diagram: Diagram) -> DescribeTool:
+    return next(tool for tool in diagram.tools if isinstance(tool, DescribeTool))
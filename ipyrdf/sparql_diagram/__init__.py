@@ -4,10 +4,13 @@ IPython-specific widgets
 # Copyright (c) 2021 trike contributors.
 # Distributed under the terms of the Modified BSD License.
 
+from .query_cache import QUERY_CACHE, QueryCache
 from .sparql_magic import sparql
 from .widget_sparql import SparqlWidget
 
 __all__ = [
+    "QUERY_CACHE",
+    "QueryCache",
     "SparqlWidget",
     "sparql",
 ]
@@ -0,0 +1,239 @@
+"""Plan the join order of basic graph patterns from the statistics of a graph"""
+from collections import OrderedDict
+from types import MethodType
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from rdflib import BNode, Graph, Variable
+from rdflib.plugins.sparql import algebra
+from rdflib.plugins.sparql.parserutils import CompValue, Expr
+from rdflib.term import Node
+
+Pattern = Tuple[Node, Node, Node]
+
+# names of filter expressions that evaluate a graph pattern of their own
+PATTERN_BUILTINS = {"Builtin_EXISTS", "Builtin_NOTEXISTS"}
+
+
+class PredicateStats(NamedTuple):
+    triples: int
+    subjects: int
+    objects: int
+
+
+class GraphStats(NamedTuple):
+    triples: int
+    subjects: int
+    objects: int
+    predicates: Dict[Node, PredicateStats]
+
+
+def graph_stats(graph: Graph) -> GraphStats:
+    """Count the triples and distinct subjects and objects, overall and per
+    predicate, in a single pass over the graph.
+
+    :param graph: graph the queries will run against
+    :return: cardinality statistics of the graph
+    """
+    triples: Dict[Node, int] = {}
+    subjects: Dict[Node, Set[Node]] = {}
+    objects: Dict[Node, Set[Node]] = {}
+    for s, p, o in graph:
+        if p not in triples:
+            triples[p] = 0
+            subjects[p], objects[p] = set(), set()
+        triples[p] += 1
+        subjects[p].add(s)
+        objects[p].add(o)
+    predicates = {
+        p: PredicateStats(count, len(subjects[p]), len(objects[p]))
+        for p, count in triples.items()
+    }
+    return GraphStats(
+        triples=sum(triples.values()),
+        # the overall distinct terms come from the same pass
+        subjects=len(set().union(*subjects.values())),
+        objects=len(set().union(*objects.values())),
+        predicates=predicates,
+    )
+
+
+def is_variable(term: Node) -> bool:
+    # blank nodes of a pattern match like variables
+    return isinstance(term, (Variable, BNode))
+
+
+def estimate(pattern: Pattern, bound: Set[Node], stats: GraphStats) -> float:
+    """Estimate the number of matches of the pattern per binding of the `bound`
+    variables, assuming terms are spread evenly over the distinct values.
+
+    :param pattern: triple pattern
+    :param bound: variables bound by the patterns evaluated before
+    :param stats: statistics of the queried graph
+    :return: estimated number of matching triples
+    """
+    s, p, o = pattern
+    if is_variable(p):
+        matches, subjects, objects = stats.triples, stats.subjects, stats.objects
+        if p in bound:
+            matches /= max(len(stats.predicates), 1)
+    else:
+        if p not in stats.predicates:
+            return 0.0
+        matches, subjects, objects = stats.predicates[p]
+    if not is_variable(s) or s in bound:
+        matches /= max(subjects, 1)
+    if not is_variable(o) or o in bound:
+        matches /= max(objects, 1)
+    return float(matches)
+
+
+def order_patterns(
+    patterns: Iterable[Pattern], stats: GraphStats, bound: Iterable[Node] = ()
+) -> List[Tuple[Pattern, float]]:
+    """Greedily order the patterns, each time picking the cheapest pattern that
+    shares a variable with the ones before it, to avoid cartesian products.
+
+    :param patterns: triple patterns of a BGP
+    :param stats: statistics of the queried graph
+    :param bound: variables bound before the BGP is evaluated
+    :return: patterns in evaluation order with their estimated matches
+    """
+    remaining = list(patterns)
+    bound = set(bound)
+    ordered = []
+    while remaining:
+
+        def cost(pattern: Pattern):
+            variables = {term for term in pattern if is_variable(term)}
+            connected = not bound or not variables or bool(variables & bound)
+            return not connected, estimate(pattern, bound, stats)
+
+        pattern = min(remaining, key=cost)
+        ordered.append((pattern, estimate(pattern, bound, stats)))
+        remaining.remove(pattern)
+        bound.update(term for term in pattern if is_variable(term))
+    return ordered
+
+
+def optimise(query: algebra.Query, stats: GraphStats) -> algebra.Query:
+    """Rewrite the query so its BGPs are evaluated in the planned order.
+
+    Each BGP with several patterns becomes a left deep chain of lazy joins of
+    single pattern BGPs, as rdflib would otherwise re-sort the patterns itself.
+    The conjuncts of a filter directly over a BGP are moved to the first point
+    of the chain where all their variables are bound. The single pattern BGPs
+    record their `step` in the plan and `estimate` of matches.
+
+    :param query: translated query, left untouched
+    :param stats: statistics of the graph the query will run against
+    :return: rewritten query for execution or display
+    """
+    return algebra.Query(query.prologue, _optimise(copy_algebra(query.algebra), stats))
+
+
+def copy_algebra(value: Any) -> Any:
+    """Copy an algebra tree so it can be rewritten without changing the original"""
+    if isinstance(value, CompValue):
+        copy = type(value).__new__(type(value))
+        copy.__dict__.update(value.__dict__)
+        evalfn = value.__dict__.get("_evalfn")
+        if isinstance(value, Expr) and evalfn is not None:
+            copy._evalfn = MethodType(evalfn.__func__, copy)
+        OrderedDict.update(
+            copy, ((k, copy_algebra(v)) for k, v in OrderedDict.items(value))
+        )
+        return copy
+    if isinstance(value, list):
+        return [copy_algebra(v) for v in value]
+    return value
+
+
+def _optimise(value: Any, stats: GraphStats) -> Any:
+    if isinstance(value, list):
+        return [_optimise(v, stats) for v in value]
+    if not isinstance(value, CompValue):
+        return value
+    if value.name == "Filter" and _is_bgp(OrderedDict.get(value, "p")):
+        return _plan_bgp(OrderedDict.get(value, "p"), stats, value)
+    if value.name == "BGP":
+        return _plan_bgp(value, stats)
+    for key, child in OrderedDict.items(value):
+        OrderedDict.__setitem__(value, key, _optimise(child, stats))
+    return value
+
+
+def _is_bgp(value: Any) -> bool:
+    return isinstance(value, CompValue) and value.name == "BGP"
+
+
+def _plan_bgp(bgp: CompValue, stats: GraphStats, filter: CompValue = None):
+    patterns = OrderedDict.get(bgp, "triples")
+    if len(patterns) < 2:
+        return filter if filter is not None else bgp
+
+    pending = []
+    if filter is not None:
+        pending = [
+            (conjunct, _expr_variables(conjunct))
+            for conjunct in _conjuncts(OrderedDict.get(filter, "expr"))
+        ]
+
+    plan = None
+    bound: Set[Node] = set()
+    for step, (pattern, matches) in enumerate(order_patterns(patterns, stats), 1):
+        part = algebra.BGP([pattern])
+        part["step"] = step
+        part["estimate"] = matches
+        # variables the part may bind, as set by rdflib's translation
+        part["_vars"] = {term for term in pattern if isinstance(term, Variable)}
+        if plan is None:
+            plan = part
+        else:
+            plan = algebra.Join(plan, part)
+            plan["lazy"] = True
+            plan["_vars"] = plan.p1["_vars"] | part["_vars"]
+        bound.update(term for term in pattern if is_variable(term))
+        waiting = []
+        for conjunct, variables in pending:
+            if variables is not None and variables <= bound:
+                plan = _filter_over(filter, conjunct, plan)
+            else:
+                waiting.append((conjunct, variables))
+        pending = waiting
+    for conjunct, _ in pending:
+        # uses variables bound outside of the BGP or evaluates its own pattern
+        plan = _filter_over(filter, conjunct, plan)
+    return plan
+
+
+def _filter_over(filter: CompValue, expr: Any, p: CompValue) -> CompValue:
+    pushed = copy_algebra(filter)
+    OrderedDict.__setitem__(pushed, "expr", expr)
+    OrderedDict.__setitem__(pushed, "p", p)
+    OrderedDict.__setitem__(pushed, "_vars", set(OrderedDict.get(p, "_vars")))
+    return pushed
+
+
+def _conjuncts(expr: Any) -> List:
+    if isinstance(expr, CompValue) and expr.name == "ConditionalAndExpression":
+        return [expr.expr, *expr.other]
+    return [expr]
+
+
+def _expr_variables(expr: Any) -> Optional[Set[Variable]]:
+    """Variables used by the expression, `None` if it evaluates a pattern"""
+    variables: Set[Variable] = set()
+    names: Set[str] = set()
+    stack = [expr]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, Variable):
+            variables.add(value)
+        elif isinstance(value, CompValue):
+            names.add(value.name)
+            stack.extend(OrderedDict.values(value))
+        elif isinstance(value, (list, tuple, set)):
+            stack.extend(value)
+    if PATTERN_BUILTINS & names:
+        return None
+    return variables
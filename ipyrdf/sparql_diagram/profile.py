@@ -0,0 +1,124 @@
+"""Time each algebra operator of a SPARQL query while it is evaluated"""
+import time
+from collections.abc import Mapping
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Tuple
+
+from rdflib import Graph
+from rdflib.plugins.sparql import CUSTOM_EVALS, algebra
+from rdflib.plugins.sparql.evaluate import evalPart
+from rdflib.plugins.sparql.parserutils import CompValue
+from rdflib.query import Result
+
+
+class OperatorStats:
+    """Accumulated cost of one algebra operator.
+
+    `elapsed` includes the time spent in the operators below it, `own` only
+    the time of the operator itself. An operator re-evaluated for each row of
+    its parent (e.g. the right side of a LeftJoin) adds up over all `calls`.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.rows = 0
+        self.elapsed = 0.0
+        self.children = 0.0
+
+    @property
+    def own(self) -> float:
+        return self.elapsed - self.children
+
+    def __repr__(self) -> str:
+        return (
+            f"{self.name}: {self.rows} rows, {self.calls} calls, "
+            f"{self.elapsed * 1000:.1f} ms ({self.own * 1000:.1f} ms own)"
+        )
+
+
+class Profile(NamedTuple):
+    result: Result
+    stats: Dict[int, OperatorStats]
+
+
+class Profiler:
+    """Custom rdflib evaluation that wraps the default evaluation of every
+    algebra part, counting the rows it yields and the time spent producing them.
+
+    Stats are keyed by the `id` of the algebra part.
+    """
+
+    def __init__(self):
+        self.stats: Dict[int, OperatorStats] = {}
+        self._active = set()
+        self._stack: List[OperatorStats] = []
+
+    def __call__(self, ctx, part: CompValue):
+        key = id(part)
+        if key in self._active:
+            raise NotImplementedError  # let rdflib evaluate the part itself
+        stats = self.stats.get(key)
+        if stats is None:
+            stats = self.stats[key] = OperatorStats(part.name)
+        stats.calls += 1
+        self._active.add(key)
+        try:
+            evaluated = self._timed(stats, evalPart, ctx, part)
+        finally:
+            self._active.discard(key)
+        if isinstance(evaluated, Mapping):
+            return evaluated  # query forms return their result, not rows
+        return self._rows(stats, evaluated)
+
+    def _timed(self, stats: OperatorStats, func, *args):
+        stack = self._stack
+        stack.append(stats)
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            stack.pop()
+            stats.elapsed += elapsed
+            if stack:
+                stack[-1].children += elapsed
+
+    def _rows(self, stats: OperatorStats, rows: Iterable) -> Iterator:
+        rows = iter(rows)
+        done = object()
+        while True:
+            row = self._timed(stats, next, rows, done)
+            if row is done:
+                return
+            stats.rows += 1
+            yield row
+
+
+def profile_query(
+    graph: Graph, query: algebra.Query, bindings: Dict[str, Any] = None
+) -> Profile:
+    """Evaluate the query against the graph, timing each algebra operator
+
+    :param graph: graph to query
+    :param query: translated query
+    :param bindings: initial variable bindings, defaults to None
+    :return: fully evaluated result and the operator stats by algebra part id
+    """
+    profiler = Profiler()
+    key = f"ipyrdf-profile-{id(profiler)}"
+    CUSTOM_EVALS[key] = profiler
+    try:
+        result = graph.query(query, initBindings=bindings)
+        if result.type == "SELECT":
+            result.bindings  # pull every row while profiling
+    finally:
+        del CUSTOM_EVALS[key]
+    return Profile(result, profiler.stats)
+
+
+def stats_labels(stats: OperatorStats) -> Tuple[str, str]:
+    """Short lines describing the cost of an operator for the diagram"""
+    return (
+        f"{stats.name}: {stats.rows} rows",
+        f"{stats.elapsed * 1000:.1f} ms ({stats.own * 1000:.1f} ms own)",
+    )
@@ -0,0 +1,145 @@
+"""Cache parsed and translated SPARQL queries keyed by a hash of their text"""
+import copyreg
+import hashlib
+import io
+import pickle
+from collections import OrderedDict
+from pathlib import Path
+from types import MethodType
+from typing import Dict, List, Optional, Union
+
+from pyparsing import ParseResults
+from rdflib.plugins.sparql import algebra, parser
+from rdflib.plugins.sparql.parserutils import CompValue, Expr
+
+QUERY_CACHE_SIZE = 64
+
+
+def _rebuild_comp_value(cls, name, attrs, evalfn, items):
+    value = cls.__new__(cls)
+    value.__dict__.update(attrs)
+    value.name = name
+    if evalfn is not None:
+        value._evalfn = MethodType(evalfn, value)
+    OrderedDict.update(value, items)
+    return value
+
+
+def _reduce_comp_value(value: CompValue):
+    # CompValue needs its name to be created and answers `None` for any missing
+    # attribute, which trips up the default pickling of OrderedDict subclasses
+    attrs = dict(value.__dict__)
+    evalfn = attrs.pop("_evalfn", None)
+    evalfn = getattr(evalfn, "__func__", None)
+    return _rebuild_comp_value, (
+        type(value),
+        attrs.pop("name"),
+        attrs,
+        evalfn,
+        list(OrderedDict.items(value)),
+    )
+
+
+_DISPATCH = copyreg.dispatch_table.copy()
+_DISPATCH[CompValue] = _DISPATCH[Expr] = _reduce_comp_value
+
+
+class QueryCache:
+    """Least recently used parse trees and algebra of SPARQL query texts.
+
+    The translated algebra is looked up from the parse tree handed out by
+    `parse`, so re-running an unchanged query costs a hash of its text. With a
+    `path` the parse trees, the slow part, are also pickled to that directory
+    and read back by later kernels. The algebra holds lambdas that cannot be
+    pickled and is only kept in memory.
+
+    :param size: number of queries to keep in memory
+    :param path: directory to persist the entries in, defaults to None
+    """
+
+    def __init__(self, size: int = QUERY_CACHE_SIZE, path: Union[str, Path] = None):
+        self.size = size
+        self.path = path
+        # parse tree and algebra (once translated) by digest of the query text
+        self._entries: Dict[str, List] = OrderedDict()
+        self._digests: Dict[int, str] = {}
+
+    @property
+    def path(self) -> Optional[Path]:
+        return self._path
+
+    @path.setter
+    def path(self, path: Union[str, Path, None]):
+        self._path = None if path is None else Path(path)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def parse(self, text: str) -> ParseResults:
+        """Parse the query text, reusing the parse tree of an identical text"""
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        entries = self._entries
+        entry = entries.get(digest)
+        if entry is not None:
+            entries.move_to_end(digest)
+            return entry[0]
+        parse_tree = self._load(digest)
+        if parse_tree is None:
+            parse_tree = parser.parseQuery(text)
+            self._dump(digest, parse_tree)
+        entries[digest] = entry = [parse_tree, None]
+        self._digests[id(entry[0])] = digest
+        self._trim()
+        return entry[0]
+
+    def translate(
+        self, parse_tree: ParseResults, base: str = None, initNs: Dict = None
+    ) -> algebra.Query:
+        """Translate a parse tree into algebra, once per parse tree from `parse`.
+
+        The prologue is part of the query text, so `base` and `initNs` are
+        expected to be the ones declared by the parse tree itself.
+        """
+        digest = self._digests.get(id(parse_tree))
+        entry = self._entries.get(digest)
+        if entry is None or entry[0] is not parse_tree:
+            # not handed out by this cache
+            return algebra.translateQuery(parse_tree, base, initNs)
+        if entry[1] is None:
+            entry[1] = algebra.translateQuery(parse_tree, base, initNs)
+        return entry[1]
+
+    def clear(self):
+        """Forget the queries held in memory, persisted entries are kept"""
+        self._entries.clear()
+        self._digests.clear()
+
+    def _trim(self):
+        while len(self._entries) > max(self.size, 0):
+            _, (parse_tree, _) = self._entries.popitem(last=False)
+            self._digests.pop(id(parse_tree), None)
+
+    def _load(self, digest: str) -> Optional[ParseResults]:
+        if self._path is None:
+            return None
+        try:
+            return pickle.loads((self._path / f"{digest}.pickle").read_bytes())
+        except Exception:
+            # missing, from another rdflib version or otherwise unreadable
+            return None
+
+    def _dump(self, digest: str, parse_tree: ParseResults):
+        if self._path is None:
+            return
+        buffer = io.BytesIO()
+        pickler = pickle.Pickler(buffer)
+        pickler.dispatch_table = _DISPATCH
+        try:
+            pickler.dump(parse_tree)
+        except Exception:
+            return  # keep it in memory only
+        self._path.mkdir(parents=True, exist_ok=True)
+        (self._path / f"{digest}.pickle").write_bytes(buffer.getvalue())
+
+
+QUERY_CACHE = QueryCache()
@@ -1,24 +1,27 @@
-from typing import Dict, List, Optional, Set, Tuple
+from functools import partial
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
 
-from ipyelk.diagram import layout_options as opt
 from ipyelk.elements import (  # Compartment,; Compound,; Edge,; Mark,; Record,
     Label,
     Node,
     Port,
+    layout_options as opt,
 )
+from pydantic import PrivateAttr
 
 # from ipyelk.diagram.shape import shapes
 from rdflib.plugins.sparql import parserutils
 from rdflib.plugins.sparql.parserutils import CompValue, ParseResults
 from rdflib.term import Literal, URIRef, Variable
 
-from .rdf_diagram import (
+from ..rdf_diagram.rdf_diagram import (
     RDFElement,
     RDFLiteralBinding,
     RDFPartition,
     RDFURIRef,
     rdf_label,
 )
+from .profile import OperatorStats, stats_labels
 
 ExpressionOps = {
     # "RelationalExpression": "",
@@ -36,20 +39,45 @@ def get_expr_name(name):
     return ExpressionOps.get(name, name)
 
 
-def get_vars(expr):
-    _vars = set()
-    if "_vars" in expr:
-        _vars |= expr._vars
-    if "expr" in expr:
-        if isinstance(expr.expr, Variable):
-            _vars |= set([expr.expr])
-    if isinstance(expr, dict):
-        for k, v in expr.items():
-            _vars |= get_vars(v)
-    elif isinstance(expr, list):
-        for v in expr:
-            _vars |= get_vars(v)
-    return _vars
+def get_vars(expr, memo: Dict[int, FrozenSet[Variable]] = None) -> FrozenSet:
+    """Variables of an algebra expression, walking it with an explicit stack
+
+    :param expr: algebra expression
+    :param memo: variable sets by id of the dicts and lists already walked,
+    shared by calls on parts of the same (unchanged) algebra, defaults to None
+    :return: variables of `_vars` and variable `expr` entries, at any depth
+    """
+    if not isinstance(expr, (dict, list)):
+        return frozenset()
+    if memo is None:
+        memo = {}
+    stack = [(expr, False)]
+    while stack:
+        node, children_done = stack.pop()
+        if not children_done:
+            if id(node) not in memo:
+                stack.append((node, True))
+                stack.extend(
+                    (child, False)
+                    for child in _children(node)
+                    if isinstance(child, (dict, list))
+                )
+            continue
+        _vars = set()
+        if isinstance(node, dict):
+            if "_vars" in node:
+                _vars |= node["_vars"]
+            if "expr" in node and isinstance(node["expr"], Variable):
+                _vars.add(node["expr"])
+        for child in _children(node):
+            if isinstance(child, (dict, list)):
+                _vars |= memo[id(child)]
+        memo[id(node)] = frozenset(_vars)
+    return memo[id(expr)]
+
+
+def _children(node):
+    return node.values() if isinstance(node, dict) else node
 
 
 def extract_prologue(parse_tree: ParseResults) -> Tuple[Optional[str], Dict]:
@@ -76,6 +104,9 @@ class SparqlExpression(RDFElement):
 
 
 class SparqlPartition(RDFPartition):
+    # algebra parts drawn by this partition, to annotate them after evaluation
+    _parts: List[CompValue] = PrivateAttr(default_factory=list)
+
     def add_expr(self, expr, parent: RDFElement = None) -> SparqlExpression:
         if parent is None:
             parent = self
@@ -87,7 +118,7 @@ class SparqlPartition(RDFPartition):
             edge = self[source : target : rdf_label(self.ns, expr.op)]
             edge.add_class("rdf-expression")
         elif expr.name == "OrderCondition":
-            child = self._get_child(expr.expr, parent)
+            child = self._get_child(expr.expr, parent=parent)
             if expr.order:
                 title = child.labels[0].text
                 child.labels[0].text = f"{expr.order}({title})"
@@ -106,14 +137,7 @@ class SparqlPartition(RDFPartition):
         edge.add_class("rdf-expression")
         return target
 
-    def _get_child(self, term, key=None, parent=None):
-        if parent is None:
-            parent = self
-        if key is None:
-            key = term
-
-        if key in parent._child_namespace:
-            return parent._child_namespace[key]
+    def _new_node(self, term, key) -> RDFElement:
         # test type of key: [uri, variable, literal]
         _cls = RDFElement
         text = rdf_label(self.ns, term)
@@ -124,33 +148,70 @@ class SparqlPartition(RDFPartition):
         elif isinstance(term, URIRef):
             _cls = RDFURIRef
 
-        node = _cls(labels=[Label(text=text)])
-        return parent.add_child(node, key)
+        return _cls(labels=[Label(text=text)])
 
 
 def loop(t, context: SparqlPartition, parent: RDFElement = None):
+    """Draw the algebra into the context partition.
+
+    The algebra is walked with an explicit stack of work instead of recursion,
+    so deeply nested queries (e.g. hundreds of UNION branches) do not hit the
+    recursion limit. A work item is either a `(value, context, parent)` tuple
+    to draw or a callable run once the items before it are done, returning
+    more work. Variable sets are memoised per algebra node for the walk.
+
+    :param t: algebra (or any part of it) to draw
+    :param context: partition to draw into
+    :param parent: element expressions are added to, defaults to the context
+    :return: the context partition
+    """
+    memo: Dict[int, FrozenSet[Variable]] = {}
+    stack = [(t, context, parent)]
+    while stack:
+        item = stack.pop()
+        if callable(item):
+            work = item()
+        else:
+            work = _visit(*item, memo=memo)
+        # pushed in reverse to be done in order
+        stack.extend(reversed(work or ()))
+    return context
+
+
+def _visit(t, context: SparqlPartition, parent: RDFElement, memo: Dict) -> List:
     # flexibility for assigning hierarchy
     if parent is None:
         parent = context
     if isinstance(t, CompValue):
         if t.name == "BGP":
+            context._parts.append(t)
             for s, p, o in t["triples"]:
-                context.add_triple(s, p, o)
+                edge = context.add_triple(s, p, o)
+                if edge is not None and "step" in t:
+                    # single pattern BGP planned by the optimiser
+                    text = f"#{t['step']} ~{t['estimate']:.3g}"
+                    edge.labels.append(Label(text=text).add_class("rdf-plan"))
+            return []
 
         elif t.name == "Graph":
             graph = SparqlPartition(
                 labels=[Label(text=rdf_label(context.ns, t.term))], ns=context.ns
             ).add_class("rdf-graph")
+            graph._parts.append(t)
             context.add_child(graph)
-            loop(t.p, context=graph)
+            return [(t.p, graph, None)]
 
         elif t.name == "OrderBy":
             orderby = SparqlPartition(
                 labels=[Label(text="OrderBy").add_class("rdf-keyword")], ns=context.ns
             ).add_class("rdf-expression")
+            orderby._parts.append(t)
             context.add_child(orderby)
-            loop(t.p, context=context)
-            orderby.add_expr(t.expr)
+
+            def add_conditions():
+                orderby.add_expr(t.expr)
+
+            return [(t.p, context, None), add_conditions]
 
         elif t.name == "Union":
             union = SparqlPartition(
@@ -158,13 +219,11 @@ def loop(t, context: SparqlPartition, parent: RDFElement = None):
             ).add_class("rdf-expression")
             c1 = SparqlPartition(ns=context.ns)
             c2 = SparqlPartition(ns=context.ns)
-            loop(t.p1, context=c1)
-            loop(t.p2, context=c2)
-
+            union._parts.append(t)
             context.add_child(union)
             union.add_child(c1)
             union.add_child(c2)
-            # out.append(union)
+            return [(t.p1, c1, None), (t.p2, c2, None)]
 
         elif t.name == "Filter":
             f = SparqlPartition(
@@ -174,75 +233,107 @@ def loop(t, context: SparqlPartition, parent: RDFElement = None):
                     )
                 ]
             ).add_class("rdf-expression")
+            f._parts.append(t)
             context.add_child(f)
-            loop(t.expr, context=f)
-            connect_ports(context, f, get_vars(t.expr))
-            loop(t.p, context=context)
+            return [
+                (t.expr, f, None),
+                partial(connect_ports, context, f, get_vars(t.expr, memo)),
+                (t.p, context, None),
+            ]
 
         elif t.name == "LeftJoin":
-            loop(t.p1, context=context)
-            optional = SparqlPartition(
-                labels=[Label(text="Optional").add_class("rdf-keyword")], ns=context.ns
-            )
-            context.add_child(optional)
-            loop(t.p2, context=optional)
-
-            # process shared variables... turn into ports on the optional block
-            for shared in set(t.p1._vars) & set(t.p2._vars):
-                source = context._get_child(shared)
-                target = optional._get_child(shared)
-                port = optional.add_port(
-                    port=Port().add_class("rdf-optional"), key=shared
-                )
-                context[source:port]
-                optional[port:target]
+            return [(t.p1, context, None), partial(_optional, t, context)]
+
         elif "expr" in t.keys():
             if t.name == "ConditionalAndExpression":
-                ConditionalAndExpression(t, context=context, parent=parent)
-            else:
-                context.add_expr(t, parent=parent)
+                return _conditional_and(t, context, parent, memo)[2]
+            context.add_expr(t, parent=parent)
+            return []
 
-        else:
-            for k, v in t.items():
-                loop(v, context=context, parent=parent)
+        return [(v, context, parent) for v in t.values()]
 
     elif isinstance(t, dict):
-        for k, v in t.items():
-            loop(v, context=context, parent=parent)
+        return [(v, context, parent) for v in t.values()]
     elif isinstance(t, list):
-        for e in t:
-            loop(e, context=context, parent=parent)
-    return context
+        return [(e, context, parent) for e in t]
+    return []
+
+
+def _optional(t: CompValue, context: SparqlPartition) -> List:
+    optional = SparqlPartition(
+        labels=[Label(text="Optional").add_class("rdf-keyword")], ns=context.ns
+    )
+    optional._parts.append(t)
+    context.add_child(optional)
+
+    def connect():
+        # process shared variables... turn into ports on the optional block
+        for shared in set(t.p1._vars) & set(t.p2._vars):
+            source = context._get_child(shared)
+            target = optional._get_child(shared)
+            port = optional.add_port(port=Port().add_class("rdf-optional"), key=shared)
+            context[source:port]
+            optional[port:target]
+
+    return [(t.p2, optional, None), connect]
+
+
+def annotate_profile(partition: SparqlPartition, stats: Dict[int, OperatorStats]):
+    """Label the partitions drawn by `loop` with the cost of their algebra parts
+
+    :param partition: partition returned by `loop`
+    :param stats: operator stats by algebra part id, see `profile_query`
+    """
+    nodes = [partition]
+    while nodes:
+        node = nodes.pop()
+        nodes.extend(node.children)
+        for part in getattr(node, "_parts", ()):
+            if id(part) in stats:
+                for text in stats_labels(stats[id(part)]):
+                    node.labels.append(Label(text=text).add_class("rdf-profile"))
 
 
 def remove_child(partition: Node, child: Node, key: str = ""):
-    if child in partition.children:
-        partition.children.remove(child)
-    if key:
-        partition._child_namespace.pop(key, None)
+    # the parent reference avoids scanning the children for membership, and
+    # partitions drop the child from their key index as well
+    if child.get_parent() is partition:
+        partition.remove_child(child)
     return child
 
 
 def ConditionalAndExpression(
     t, context: SparqlPartition, parent: RDFElement = None
 ) -> List[SparqlPartition]:
+    c1, c2, work = _conditional_and(t, context, parent, {})
+    for item in work:
+        if callable(item):
+            item()
+        else:
+            loop(item[0], context=item[1])
+    return [c1, c2]
+
+
+def _conditional_and(
+    t, context: SparqlPartition, parent: RDFElement, memo: Dict
+) -> Tuple[SparqlPartition, SparqlPartition, List]:
     if parent is None:
         parent = context
     # need some extra effort to promote the variables in the expression
-    v1 = get_vars(t.expr)
-    v2 = get_vars(t.other)
+    v1 = get_vars(t.expr, memo)
+    v2 = get_vars(t.other, memo)
 
     c1 = SparqlPartition(ns=context.ns).add_class("rdf-expression")
     c2 = SparqlPartition(ns=context.ns).add_class("rdf-expression")
-    loop(t.expr, context=c1)
-    loop(t.other, context=c2)
-    parent.add_child(c1)
-    parent.add_child(c2)
 
-    connect_ports(context, c1, v1)
-    connect_ports(context, c2, v2)
+    def connect():
+        parent.add_child(c1)
+        parent.add_child(c2)
 
-    return [c1, c2]
+        connect_ports(context, c1, v1)
+        connect_ports(context, c2, v2)
+
+    return c1, c2, [(t.expr, c1, None), (t.other, c2, None), connect]
 
 
 def connect_ports(c1, c2, terms):
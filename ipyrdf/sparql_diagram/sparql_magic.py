@@ -1,8 +1,8 @@
 from IPython.core.magic import needs_local_scope, register_cell_magic
-from rdflib.plugins.sparql import parser
 
-from ..widgets.widget_sparql import SparqlWidget
-from .util import set_variable
+from ..util import set_variable
+from .query_cache import QUERY_CACHE
+from .widget_sparql import SparqlWidget
 
 
 @register_cell_magic
@@ -21,7 +21,8 @@ def sparql(parameters: str, cell: str, local_ns: dict = None):
     if len(params) == 1 and len(params[0]) >= 1:
         var_name = params[0]
 
-    value = parser.parseQuery(cell)
+    # unchanged cells reuse their parse tree, and the widget its algebra
+    value = QUERY_CACHE.parse(cell)
     if var_name is not None:
         set_variable(var_name, value, local_ns)
     else:
@@ -1,34 +1,44 @@
+from typing import Any, Dict
+
 import traitlets as T
-from ipyelk import Elk, nx
-from ipyelk.diagram import elk_model
-from ipyelk.diagram import layout_options as opt
-from ipyelk.elements import Compartment, Mark, MarkFactory
-from ipyelk.tools import tools
+from ipyelk import Diagram, ElementLoader
+from ipyelk.elements import Label, layout_options as opt
 from ipyrdf import NSWrapper
 from pyparsing import ParseResults
+from rdflib import Graph
 from rdflib.plugins.sparql import algebra
 from rdflib.plugins.sparql.parserutils import prettify_parsetree
+from rdflib.query import Result
 
-from .sparql_diagram import SparqlPartition, extract_prologue, loop
+from ..rdf_diagram.rdf_diagram import RDF_DIAGRAM_SYMBOLS
+from .optimiser import graph_stats, optimise
+from .profile import profile_query
+from .query_cache import QUERY_CACHE
+from .sparql_diagram import SparqlPartition, annotate_profile, extract_prologue, loop
 
 
-class ToggleRecordBtn(tools.ToggleCollapsedBtn):
-    def get_related(self, node):
-        tree = self.app.transformer.source[1]
-        if isinstance(node, Mark) and isinstance(node.node, Compartment):
-            parent = list(tree.predecessors(node))[0]
-            return [child for i, child in enumerate(tree.neighbors(parent)) if i > 0]
-        return super().get_related(node)
+class SparqlLoader(ElementLoader):
+    @T.default("default_root_opts")
+    def _default_root_opts(self):
+        return {
+            opt.HierarchyHandling.identifier: opt.HierarchyHandling().value,
+            opt.Direction.identifier: opt.Direction(value="RIGHT").value,
+        }
 
 
-class SparqlWidget(Elk):
+class SparqlWidget(Diagram):
     parse_tree = T.Instance(ParseResults)
     query = T.Instance(algebra.Query)
+    plan = T.Instance(
+        algebra.Query, allow_none=True, help="query rewritten by `optimise`"
+    )
+    stats = T.Dict(help="operator stats by algebra part id from the last `explain`")
     ns = T.Instance(NSWrapper, kw={})
+    loader = T.Instance(SparqlLoader, kw={})
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self._make_toolbar()
+    @T.default("symbols")
+    def _default_symbols(self):
+        return RDF_DIAGRAM_SYMBOLS
 
     @T.default("style")
     def _default_style(self):
@@ -56,6 +66,8 @@ class SparqlWidget(Elk):
                 "rx": "10px",
                 "ry": "10px",
             },
+            " .rdf-profile.elklabel": {"fill": "var(--jp-warn-color1)"},
+            " .rdf-plan.elklabel": {"fill": "var(--jp-info-color1)"},
             " .rdf-expression  > .elkport": {
                 "stroke": "var(--jp-mirror-editor-builtin-color)",
                 # "rx": "10px",
@@ -69,29 +81,6 @@ class SparqlWidget(Elk):
             #     },
         }
 
-    @T.default("transformer")
-    def _default_transformer(self):
-        diagram_opts = opt.OptionsWidget(
-            options=[opt.Direction(value="RIGHT"), opt.HierarchyHandling()]
-        ).value
-
-        return nx.XELK(
-            layouts={
-                elk_model.ElkRoot: {
-                    "parents": diagram_opts,
-                }
-            }
-        )
-
-    @T.default("layout")
-    def _default_layout(self):
-        return {"height": "100%"}
-
-    def _make_toolbar(self):
-        toggle = ToggleRecordBtn(app=self)
-        fit = tools.FitBtn(app=self)
-        self.toolbar.commands = [fit, toggle]
-
     @T.observe("parse_tree")
     def _handle_parse_tree(self, change=None):
         base, initNs = extract_prologue(self.parse_tree)
@@ -99,13 +88,57 @@ class SparqlWidget(Elk):
             setattr(self.ns, key, value)
         if base:
             setattr(self.ns, "", base)
-        self.query = algebra.translateQuery(self.parse_tree, base, initNs)
+        self.query = QUERY_CACHE.translate(self.parse_tree, base, initNs)
 
     @T.observe("query")
     def _handle_query(self, change):
-        ans = loop(self.query.algebra, context=SparqlPartition(ns=self.ns))
-        cp = MarkFactory()
-        self.transformer.source = cp(ans)
+        if change is not None:
+            # measured and planned for the previous query
+            self.stats = {}
+            self.plan = None
+        if self.plan is None:
+            ans = loop(self.query.algebra, context=SparqlPartition(ns=self.ns))
+        else:
+            ans = SparqlPartition(ns=self.ns)
+            for title, query in [("Original", self.query), ("Optimised", self.plan)]:
+                plan = SparqlPartition(
+                    labels=[Label(text=title).add_class("rdf-keyword")], ns=self.ns
+                )
+                ans.add_child(plan)
+                loop(query.algebra, context=plan)
+        if self.stats:
+            annotate_profile(ans, self.stats)
+        if ans.labels:
+            # the root of the diagram cannot have labels, draw it as a block
+            root = SparqlPartition(ns=self.ns)
+            root.add_child(ans)
+            ans = root
+        self.source = self.loader.load(root=ans)
+
+    def optimise(self, graph: Graph) -> algebra.Query:
+        """Plan the join order of the BGPs of the query from the statistics of the
+        graph and draw the original and optimised plans side by side
+
+        :param graph: graph the query will run against
+        :return: rewritten query, also kept as `plan`
+        """
+        self.plan = optimise(self.query, graph_stats(graph))
+        self._handle_query(None)
+        return self.plan
+
+    def explain(self, graph: Graph, bindings: Dict[str, Any] = None) -> Result:
+        """Evaluate the query, or its `plan` once optimised, against the graph and
+        label the diagram with the rows and time of each algebra operator, like an
+        `EXPLAIN ANALYZE`
+
+        :param graph: graph to query
+        :param bindings: initial variable bindings, defaults to None
+        :return: fully evaluated query result
+        """
+        query = self.query if self.plan is None else self.plan
+        result, self.stats = profile_query(graph, query, bindings)
+        self._handle_query(None)
+        return result
 
     def pretty(self):
         print(prettify_parsetree(self.query.algebra))
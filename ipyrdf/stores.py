@@ -0,0 +1,61 @@
+"""Open graphs backed by persistent rdflib stores from a short text spec"""
+from typing import Dict, Optional, Tuple
+
+from rdflib import Graph, plugin
+from rdflib.plugin import PluginException
+from rdflib.store import Store
+
+from .versioning import VersionedGraph
+
+_GRAPHS: Dict[Tuple[str, Optional[str]], Graph] = {}
+
+
+def parse_store_spec(spec: str) -> Optional[Tuple[str, str]]:
+    """Split a `<plugin>:<configuration>` spec, e.g. `BerkeleyDB:/data/kb`
+
+    :param spec: store spec
+    :return: store plugin name and configuration, or `None` if the text is not
+    a spec, e.g. the name of a variable holding a store
+    :raises ValueError: if the spec names a store plugin that is not available
+    """
+    name, sep, configuration = spec.partition(":")
+    if not sep:
+        return None
+    try:
+        plugin.get(name, Store)
+    except PluginException as error:
+        raise ValueError(
+            f"store plugin {name!r} is not available, install the package "
+            "providing it (e.g. `berkeleydb` for BerkeleyDB)"
+        ) from error
+    return name, configuration
+
+
+def open_graph(spec: str, identifier: str = None, create: bool = True) -> Graph:
+    """Get the graph for the store spec, opening the store on first use only.
+
+    Opened graphs are kept per spec and identifier so later calls reuse the
+    same store connection instead of opening it (and its locks) again.
+
+    :param spec: `<plugin>:<configuration>` store spec
+    :param identifier: identifier for the graph, defaults to None
+    :param create: create the store if it does not exist yet
+    :return: graph backed by the store
+    """
+    key = (spec, identifier)
+    if key not in _GRAPHS:
+        parsed = parse_store_spec(spec)
+        if parsed is None:
+            raise ValueError(f"{spec} is not a `<plugin>:<configuration>` store spec")
+        name, configuration = parsed
+        graph = VersionedGraph(store=name, identifier=identifier)
+        graph.open(configuration, create=create)
+        _GRAPHS[key] = graph
+    return _GRAPHS[key]
+
+
+def close_graphs():
+    """Close every store opened by `open_graph`"""
+    while _GRAPHS:
+        _, graph = _GRAPHS.popitem()
+        graph.close()
@@ -0,0 +1,44 @@
+"""Dictionary encoding of rdf terms as dense integer ids"""
+from typing import Dict, Hashable, Iterable, Iterator, List, Tuple
+
+IdTriple = Tuple[int, int, int]
+
+
+class TermDictionary:
+    """Assign each term a small integer id the first time it is seen.
+
+    Hashing and comparing rdflib terms goes through the full (often long) uri
+    or literal text on every lookup. Encoding a term once and keying later
+    lookups by its id keeps the per triple work on plain ints. Ids are never
+    reassigned, so a dictionary lives as long as the partition using it: an
+    `RDFLoader` starts a new one whenever it rebuilds its partition.
+    """
+
+    def __init__(self):
+        self._ids: Dict[Hashable, int] = {}
+        self._terms: List[Hashable] = []
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def __contains__(self, term) -> bool:
+        return term in self._ids
+
+    def id(self, term) -> int:
+        """Id of the term, assigning the next free id to unseen terms"""
+        ids = self._ids
+        term_id = ids.get(term)
+        if term_id is None:
+            term_id = ids[term] = len(self._terms)
+            self._terms.append(term)
+        return term_id
+
+    def term(self, term_id: int):
+        """Term encoded by the id"""
+        return self._terms[term_id]
+
+    def encode(self, triples: Iterable[Tuple]) -> Iterator[IdTriple]:
+        """Encode each triple as a triple of ids"""
+        _id = self.id
+        for s, p, o in triples:
+            yield _id(s), _id(p), _id(o)
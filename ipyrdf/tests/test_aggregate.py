@@ -0,0 +1,39 @@
+from rdflib import RDF, Graph, Namespace
+
+from ipyrdf.queries.aggregate import OTHER_GROUP, aggregate, expand
+
+EX = Namespace("http://example.org/")
+
+
+def make_graph(classes: int = 10) -> Graph:
+    graph = Graph()
+    for i in range(classes):
+        # class i has i + 1 instances linked to the next class
+        for j in range(i + 1):
+            graph.add((EX[f"c{i}_{j}"], RDF.type, EX[f"C{i}"]))
+            graph.add((EX[f"c{i}_{j}"], EX[f"p{j}"], EX[f"c{(i + 1) % classes}_0"]))
+    return graph
+
+
+def test_groups_are_capped():
+    graph = make_graph()
+    full = aggregate(graph, by="type")
+    capped = aggregate(graph, by="type", max_groups=4)
+    assert len(capped.counts) == 4
+    assert OTHER_GROUP in capped.counts
+    # the largest groups are kept, the others merged
+    largest = sorted(full.counts, key=lambda key: -full.counts[key])[:3]
+    for key in largest:
+        assert capped.counts[key] == full.counts[key]
+    assert sum(capped.counts.values()) == sum(full.counts.values())
+    merged = [key for key in full.counts if key not in largest]
+    assert set(expand(capped, [OTHER_GROUP])) == set(expand(full, merged))
+    assert set(capped.subjects()) | set(capped.objects()) <= set(capped.counts)
+
+
+def test_edges_are_capped():
+    graph = make_graph()
+    full = aggregate(graph, by="type")
+    capped = aggregate(graph, by="type", max_edges=5)
+    assert len(capped) == 5
+    assert set(capped) <= set(full)
@@ -0,0 +1,146 @@
+import asyncio
+import threading
+from typing import Callable
+
+from rdflib import Graph, Namespace
+
+from ipyrdf.queries import describe
+from ipyrdf.rdf_diagram import describe_tool
+from ipyrdf.rdf_diagram.describe_tool import DescribeTool
+from ipyrdf.rdf_diagram.rdf_loader import RDFLoader
+from ipyrdf.versioning import VersionedGraph
+
+EX = Namespace("http://example.org/")
+
+
+def make_graph(size: int = 20) -> VersionedGraph:
+    graph = VersionedGraph()
+    graph.bind("ex", EX)
+    for i in range(size):
+        graph.add((EX[f"s{i}"], EX.p, EX[f"s{i + 1}"]))
+    return graph
+
+
+def count_calls(monkeypatch, owner, name: str) -> list:
+    calls = []
+    func = getattr(owner, name)
+
+    def counted(*args, **kwargs):
+        calls.append(args)
+        return func(*args, **kwargs)
+
+    monkeypatch.setattr(owner, name, counted)
+    return calls
+
+
+def test_aggregate_overview_is_cached(monkeypatch):
+    tool = DescribeTool(graph=make_graph(), node_budget=5, uris=None)
+    aggregations = count_calls(monkeypatch, describe_tool, "aggregate")
+    loads = count_calls(monkeypatch, RDFLoader, "load")
+    for _ in range(3):
+        tool.uris = [EX.s1]
+        tool.uris = None
+    assert aggregations == []
+    # only the selection is loaded, the overview diagram is reused
+    assert len(loads) == 1
+
+
+def run_load(tool: DescribeTool, change: Callable[[], None], during=None):
+    """Make the change on an event loop and wait for the background load
+
+    :param during: coroutine function awaited while the load runs
+    """
+
+    async def main():
+        change()
+        if during is not None:
+            await during()
+        for _ in range(500):
+            if not tool.loading:
+                return
+            await asyncio.sleep(0.01)
+        raise TimeoutError("background load did not finish")
+
+    asyncio.run(main())
+
+
+def test_threaded_load_updates_partition_on_loop(monkeypatch):
+    tool = DescribeTool(graph=make_graph(), threaded=True)
+    threads = []
+    apply_delta = RDFLoader.apply_delta
+
+    def recorded(self, delta):
+        threads.append(threading.current_thread())
+        return apply_delta(self, delta)
+
+    monkeypatch.setattr(RDFLoader, "apply_delta", recorded)
+    run_load(tool, lambda: setattr(tool, "uris", [EX.s1]))
+    assert threads == [threading.main_thread()]
+    assert set(tool.subgraph) == set(describe(tool.graph, [EX.s1]))
+    assert len(tool.loader.partition.edges) == len(tool.subgraph)
+
+
+def test_failed_threaded_load_is_reset(monkeypatch):
+    tool = DescribeTool(graph=make_graph(), threaded=True)
+
+    def fail(*args, **kwargs):
+        raise ValueError("describe failed")
+
+    monkeypatch.setattr(describe_tool, "describe", fail)
+    run_load(tool, lambda: setattr(tool, "uris", [EX.s1]))
+    assert not tool.loading
+    assert tool._pending is None
+
+    monkeypatch.undo()
+    run_load(tool, lambda: setattr(tool, "uris", None))
+    extends = count_calls(monkeypatch, RDFLoader, "extend")
+    triple = (EX.s0, EX.q, EX.s5)
+    tool.graph.add(triple)
+    tool.notify_added([triple])
+    assert len(extends) == 1
+
+
+def test_graph_swapped_during_threaded_describe(monkeypatch):
+    old, new = Graph(), Graph()
+    old.add((EX.x, EX.p, EX.old))
+    new.add((EX.x, EX.p, EX.new))
+    tool = DescribeTool(graph=old, threaded=True)
+    started, release = threading.Event(), threading.Event()
+
+    def slow(graph, *args, **kwargs):
+        if graph is old:
+            started.set()
+            release.wait(5)
+        return describe(graph, *args, **kwargs)
+
+    monkeypatch.setattr(describe_tool, "describe", slow)
+
+    async def swap():
+        while not started.is_set():
+            await asyncio.sleep(0.01)
+        tool.graph = new
+        release.set()
+
+    run_load(tool, lambda: setattr(tool, "uris", [EX.x]), swap)
+    assert set(tool.subgraph) == {(EX.x, EX.p, EX.new)}
+    (edge,) = tool.loader.partition.edges
+    assert edge.target.properties.key == EX.new
+
+
+def node_labels(tool: DescribeTool) -> dict:
+    return {
+        child.properties.key: [label.text for label in child.labels]
+        for child in tool.loader.partition.children
+    }
+
+
+def test_aggregate_counts_follow_graph_changes():
+    graph = make_graph(10)
+    tool = DescribeTool(graph=graph, node_budget=5, uris=None)
+    assert node_labels(tool)[EX[""]] == ["ex: (11)"]
+    for i in range(10, 20):
+        graph.add((EX[f"s{i}"], EX.p, EX[f"s{i + 1}"]))
+    tool.refresh()
+    assert tool.subgraph.counts[EX[""]] == 21
+    rebuilt = DescribeTool(graph=graph, node_budget=5, uris=None)
+    assert node_labels(tool) == node_labels(rebuilt) == {EX[""]: ["ex: (21)"]}
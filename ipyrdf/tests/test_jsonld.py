@@ -0,0 +1,40 @@
+import io
+import json
+
+import ujson
+from rdflib import XSD, Graph, Literal, Namespace
+
+from ipyrdf.queries.jsonld import iter_jsonld, to_jsonld, write_jsonld
+
+EX = Namespace("http://example.org/")
+
+
+def make_graph() -> Graph:
+    graph = Graph()
+    graph.bind("ex", EX)
+    graph.bind("xsd", XSD)
+    graph.add((EX.a, EX.value, Literal(1.5)))
+    graph.add((EX.a, EX.nan, Literal("NaN", datatype=XSD.double)))
+    graph.add((EX.a, EX.inf, Literal("INF", datatype=XSD.double)))
+    graph.add((EX.a, EX.ninf, Literal("-INF", datatype=XSD.double)))
+    graph.add((EX.b, EX.value, Literal(2)))
+    return graph
+
+
+def test_non_finite_doubles_are_typed_values():
+    (node,) = [n for n in to_jsonld(make_graph())["@graph"] if n["@id"] == "ex:a"]
+    assert node["ex:value"] == 1.5
+    assert node["ex:nan"] == {"@type": "xsd:double", "@value": "NaN"}
+    assert node["ex:inf"] == {"@type": "xsd:double", "@value": "INF"}
+    assert node["ex:ninf"] == {"@type": "xsd:double", "@value": "-INF"}
+
+
+def test_written_jsonld_is_strict_json():
+    graph = make_graph()
+    fp = io.StringIO()
+    write_jsonld(graph, fp)
+    data = ujson.loads(fp.getvalue())
+    assert sorted(node["@id"] for node in data["@graph"]) == ["ex:a", "ex:b"]
+    assert data["@graph"] == list(iter_jsonld(graph))
+    # fail on the NaN / Infinity extensions of python's json
+    json.loads(fp.getvalue(), parse_constant=lambda name: 1 / 0)
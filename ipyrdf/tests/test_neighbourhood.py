@@ -0,0 +1,27 @@
+from rdflib import Graph, Namespace
+
+from ipyrdf.queries import describe
+from ipyrdf.queries.neighbourhood import neighbourhood_index
+from ipyrdf.versioning import VersionedGraph
+
+EX = Namespace("http://example.org/")
+
+
+def test_index_follows_changes_of_same_size():
+    for graph in [VersionedGraph(), Graph()]:
+        graph.add((EX.a, EX.p, EX.b))
+        assert set(describe(graph, [EX.a], index=True)) == {(EX.a, EX.p, EX.b)}
+        # same number of triples after the change
+        graph.remove((EX.a, EX.p, EX.b))
+        graph.add((EX.a, EX.p, EX.c))
+        assert set(describe(graph, [EX.a], index=True)) == {(EX.a, EX.p, EX.c)}
+
+
+def test_index_is_cached_per_version():
+    graph = VersionedGraph()
+    graph.add((EX.a, EX.p, EX.b))
+    index = neighbourhood_index(graph)
+    assert neighbourhood_index(graph) is index
+    graph.add((EX.b, EX.p, EX.c))
+    assert neighbourhood_index(graph) is not index
+    assert neighbourhood_index(graph).triples(EX.c) == [(EX.b, EX.p, EX.c)]
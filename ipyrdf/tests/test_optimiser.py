@@ -0,0 +1,80 @@
+from rdflib import RDF, Graph, Literal, Namespace
+from rdflib.plugins.sparql import prepareQuery
+
+from ipyrdf.sparql_diagram.optimiser import graph_stats, optimise
+from ipyrdf.sparql_diagram.sparql_diagram import SparqlPartition, loop
+
+EX = Namespace("http://example.org/")
+
+OPTIONAL_QUERY = """
+PREFIX ex: <http://example.org/>
+SELECT * WHERE { ?s a ex:T ; ex:p ?o . OPTIONAL { ?s ex:rare ?z . ?z a ex:T } }
+"""
+
+FILTER_QUERY = """
+PREFIX ex: <http://example.org/>
+SELECT ?s ?z WHERE {
+    ?s a ex:T . ?s ex:p ?o . ?s ex:rare ?z . ?z ex:p ?w
+    FILTER(?o > 5 && ?w < 1000 && EXISTS { ?z a ex:T })
+}
+"""
+
+
+def make_graph(size: int = 100) -> Graph:
+    graph = Graph()
+    for i in range(size):
+        graph.add((EX[f"s{i}"], RDF.type, EX.T))
+        graph.add((EX[f"s{i}"], EX.p, Literal(i)))
+        if i % 10 == 0:
+            graph.add((EX[f"s{i}"], EX.rare, EX[f"s{i + 1}"]))
+    return graph
+
+
+def test_graph_stats():
+    stats = graph_stats(make_graph())
+    assert stats.triples == 210
+    assert stats.predicates[EX.rare] == (10, 10, 10)
+    assert stats.predicates[RDF.type] == (100, 100, 1)
+
+
+def test_optimised_results():
+    graph = make_graph()
+    stats = graph_stats(graph)
+    for text in [OPTIONAL_QUERY, FILTER_QUERY]:
+        query = prepareQuery(text)
+        plan = optimise(query, stats)
+        assert sorted(graph.query(plan)) == sorted(graph.query(query))
+
+
+def test_draw_optional_plan():
+    query = prepareQuery(OPTIONAL_QUERY)
+    plan = optimise(query, graph_stats(make_graph()))
+    partition = loop(plan.algebra, context=SparqlPartition())
+    optional = [
+        child for child in partition.children if child.labels[0].text == "Optional"
+    ]
+    assert len(optional) == 1
+    # the shared ?s is connected through a port of the optional block
+    assert len(optional[0].ports) == 1
+    steps = [
+        label.text
+        for edge in partition.edges
+        for label in edge.labels
+        if label.text.startswith("#")
+    ]
+    assert len(steps) == 2
+
+
+def test_graph_stats_single_pass(monkeypatch):
+    graph = make_graph()
+    passes = []
+    triples = Graph.triples
+
+    def counted(self, pattern):
+        passes.append(pattern)
+        return triples(self, pattern)
+
+    monkeypatch.setattr(Graph, "triples", counted)
+    stats = graph_stats(graph)
+    assert passes == [(None, None, None)]
+    assert (stats.subjects, stats.objects) == (100, 111)
@@ -0,0 +1,56 @@
+from rdflib import Graph, Literal, Namespace
+from rdflib.plugins.sparql import parser
+
+from ipyrdf.sparql_diagram import query_cache
+from ipyrdf.sparql_diagram.query_cache import QueryCache
+
+EX = Namespace("http://example.org/")
+
+QUERY = """
+PREFIX ex: <http://example.org/>
+SELECT ?s ?o WHERE { ?s ex:p ?o FILTER(?o > 1) } ORDER BY ?o
+"""
+
+
+def count_parses(monkeypatch) -> list:
+    calls = []
+    parse = parser.parseQuery
+
+    def counted(text):
+        calls.append(text)
+        return parse(text)
+
+    monkeypatch.setattr(query_cache.parser, "parseQuery", counted)
+    return calls
+
+
+def test_repeated_query_is_parsed_and_translated_once(monkeypatch):
+    parses = count_parses(monkeypatch)
+    cache = QueryCache()
+    tree = cache.parse(QUERY)
+    assert cache.parse(QUERY) is tree
+    assert cache.translate(tree) is cache.translate(tree)
+    assert len(parses) == 1
+
+
+def test_least_recent_query_is_dropped():
+    cache = QueryCache(size=2)
+    first = cache.parse(QUERY)
+    cache.parse(QUERY + "LIMIT 1")
+    cache.parse(QUERY + "LIMIT 2")
+    assert len(cache) == 2
+    assert cache.parse(QUERY) is not first
+
+
+def test_persisted_parse_tree_is_reused(monkeypatch, tmp_path):
+    graph = Graph()
+    for i in range(4):
+        graph.add((EX[f"s{i}"], EX.p, Literal(i)))
+    QueryCache(path=tmp_path).parse(QUERY)
+    assert len(list(tmp_path.iterdir())) == 1
+
+    parses = count_parses(monkeypatch)
+    cache = QueryCache(path=tmp_path)
+    query = cache.translate(cache.parse(QUERY))
+    assert parses == []
+    assert [row.o.toPython() for row in graph.query(query)] == [2, 3]
@@ -0,0 +1,24 @@
+import pytest
+from ipyelk import exceptions
+from rdflib import Namespace
+
+from ipyrdf.rdf_diagram.rdf_diagram import RDFPartition
+
+EX = Namespace("http://example.org/")
+
+
+def test_remove_child_keeps_index_consistent():
+    partition = RDFPartition()
+    partition.add_triples((EX[f"s{i}"], EX.p, EX[f"s{i + 1}"]) for i in range(5))
+    nodes = {term: partition.get_child(term) for term in [EX["s0"], EX["s3"]]}
+    for term, node in nodes.items():
+        assert partition.remove_child(node) is node
+        assert node.get_parent() is None
+        with pytest.raises(exceptions.NotFoundError):
+            partition.get_child(term)
+    remaining = {EX[f"s{i}"] for i in [1, 2, 4, 5]}
+    assert {child.properties.key for child in partition.children} == remaining
+    for term in remaining:
+        node = partition.get_child(term)
+        assert partition.remove_child(node) is node
+    assert partition.children == []
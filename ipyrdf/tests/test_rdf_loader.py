@@ -0,0 +1,104 @@
+from collections import Counter
+
+import pytest
+from rdflib import Graph, Literal, Namespace
+
+from ipyrdf.rdf_diagram.rdf_diagram import PREDICATE_MODES
+from ipyrdf.rdf_diagram import rdf_loader
+from ipyrdf.rdf_diagram.rdf_loader import RDFLoader
+from ipyrdf.versioning import VersionedGraph
+
+EX = Namespace("http://example.org/")
+
+
+def make_triples(start: int, stop: int):
+    for i in range(start, stop):
+        yield EX[f"s{i}"], EX.next, EX[f"s{i + 1}"]
+        yield EX[f"s{i}"], EX.other, EX[f"s{i + 1}"]
+        yield EX[f"s{i}"], EX.value, Literal(i)
+
+
+def drawn(loader: RDFLoader):
+    """Nodes and edges of the loaded partition, independent of their order"""
+    partition = loader.partition
+    nodes = Counter(
+        (child.properties.key, tuple(label.text for label in child.labels))
+        for child in partition.children
+    )
+    edges = Counter(
+        (
+            edge.source.properties.key,
+            edge.target.properties.key,
+            tuple(label.text for label in edge.labels),
+        )
+        for edge in partition.edges
+    )
+    return nodes, edges
+
+
+def rebuilt(graph: Graph, predicate_mode: str):
+    loader = RDFLoader(predicate_mode=predicate_mode)
+    loader.load(graph)
+    return drawn(loader)
+
+
+def check_partition(loader: RDFLoader):
+    partition = loader.partition
+    for child in partition.children:
+        assert partition.get_child(child.properties.key) is child
+    for child in list(partition.children):
+        assert partition.remove_child(child) is child
+    assert partition.children == []
+
+
+@pytest.mark.parametrize("predicate_mode", PREDICATE_MODES)
+def test_delta_load_matches_rebuild(predicate_mode):
+    old, new = Graph(), Graph()
+    for triple in make_triples(0, 6):
+        old.add(triple)
+    for triple in make_triples(3, 9):
+        new.add(triple)
+    new.remove((EX.s4, EX.other, None))
+
+    loader = RDFLoader(predicate_mode=predicate_mode)
+    loader.load(old)
+    loader.load(new, old)
+    assert drawn(loader) == rebuilt(new, predicate_mode)
+    check_partition(loader)
+
+
+@pytest.mark.parametrize("predicate_mode", PREDICATE_MODES)
+def test_changelog_load_matches_rebuild(predicate_mode):
+    graph = VersionedGraph()
+    for triple in make_triples(0, 6):
+        graph.add(triple)
+
+    loader = RDFLoader(predicate_mode=predicate_mode)
+    loader.load(graph)
+    for triple in make_triples(6, 9):
+        graph.add(triple)
+    graph.remove((EX.s2, None, None))
+    graph.remove((None, None, EX.s2))
+    diff = loader.diff(graph, graph)
+    assert not diff.rebuild
+    loader.load(graph, graph, diff)
+    assert drawn(loader) == rebuilt(graph, predicate_mode)
+    check_partition(loader)
+
+
+def test_terms_of_previous_graphs_are_released(monkeypatch):
+    monkeypatch.setattr(rdf_loader, "TERMS_SLACK", 10)
+    loader = RDFLoader()
+    old, sizes = None, []
+    for start in range(0, 200, 5):
+        new = Graph()
+        for triple in make_triples(start, start + 5):
+            new.add(triple)
+        loader.load(new, old)
+        old = new
+        sizes.append(len(loader.terms))
+    # each graph draws 14 terms, the 40 graphs together over 500
+    assert max(sizes) < 100
+    assert loader.partition.terms is loader.terms
+    assert drawn(loader) == rebuilt(new, "edges")
+    check_partition(loader)
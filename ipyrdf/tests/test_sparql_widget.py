@@ -0,0 +1,61 @@
+import asyncio
+from logging import ERROR
+
+from rdflib import RDF, Graph, Literal, Namespace
+
+from ipyrdf.sparql_diagram.query_cache import QUERY_CACHE
+from ipyrdf.sparql_diagram.widget_sparql import SparqlWidget
+
+EX = Namespace("http://example.org/")
+
+QUERY = """
+PREFIX ex: <http://example.org/>
+SELECT * WHERE {
+    { ?s a ex:T } UNION { ?s a ex:U }
+    ?s ex:p ?o .
+    OPTIONAL { ?s ex:rare ?z }
+}
+ORDER BY DESC(?o)
+"""
+
+
+def make_graph(size: int = 20) -> Graph:
+    graph = Graph()
+    for i in range(size):
+        graph.add((EX[f"s{i}"], RDF.type, EX.T if i % 2 else EX.U))
+        graph.add((EX[f"s{i}"], EX.p, Literal(i)))
+        if i % 5 == 0:
+            graph.add((EX[f"s{i}"], EX.rare, EX[f"s{i + 1}"]))
+    return graph
+
+
+def labels(node) -> list:
+    """Label texts of the node and everything drawn inside it"""
+    texts, nodes = [], [node]
+    while nodes:
+        node = nodes.pop()
+        texts.extend(label.text for label in node.labels)
+        nodes.extend(node.children)
+    return texts
+
+
+def test_explain_draws_profiled_operators(caplog):
+    graph = make_graph()
+
+    async def explain():
+        widget = SparqlWidget(parse_tree=QUERY_CACHE.parse(QUERY))
+        result = widget.explain(graph)
+        root = widget.source.value
+        # let the diagram pipes validate the new source
+        await asyncio.sleep(0.1)
+        return root, result
+
+    root, result = asyncio.run(explain())
+    assert list(result) == list(graph.query(QUERY))
+    assert not [record for record in caplog.records if record.levelno >= ERROR]
+    assert root.labels == []
+    texts = labels(root)
+    for keyword in ["OrderBy", "Union", "Optional", "DESC(?o)"]:
+        assert keyword in texts
+    for stats in ["OrderBy: 20 rows", "Union: 20 rows", "LeftJoin: 20 rows"]:
+        assert stats in texts
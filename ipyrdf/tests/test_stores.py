@@ -0,0 +1,44 @@
+import pytest
+from rdflib import Namespace
+
+from ipyrdf.rdf_diagram.turtle_magic import turtle
+from ipyrdf.stores import close_graphs, open_graph, parse_store_spec
+from ipyrdf.versioning import VersionedGraph
+
+EX = Namespace("http://example.org/")
+
+CELL = "@prefix ex: <http://example.org/> . ex:a ex:p ex:b ."
+
+
+@pytest.fixture(autouse=True)
+def closed_graphs():
+    yield
+    close_graphs()
+
+
+def test_open_graph_reuses_store():
+    graph = open_graph("Memory:kb", identifier="urn:kb")
+    assert isinstance(graph, VersionedGraph)
+    assert type(graph.store).__name__ == "Memory"
+    assert open_graph("Memory:kb", identifier="urn:kb") is graph
+    assert open_graph("Memory:kb", identifier="urn:other") is not graph
+
+
+def test_missing_store_plugin():
+    assert parse_store_spec("store_variable") is None
+    with pytest.raises(ValueError, match="'NoSuchStore' is not available"):
+        parse_store_spec("NoSuchStore:/path/to/db")
+    with pytest.raises(ValueError, match="not a `<plugin>:<configuration>`"):
+        open_graph("store_variable")
+
+
+def test_turtle_store_spec():
+    local_ns = {"g": None}
+    turtle("g --store Memory:kb --id urn:kb", CELL, local_ns=local_ns)
+    assert local_ns["g"] is open_graph("Memory:kb", identifier="urn:kb")
+    assert (EX.a, EX.p, EX.b) in local_ns["g"]
+
+    local_ns = {"g": None}
+    with pytest.raises(ValueError, match="not available"):
+        turtle("g --store NoSuchStore:/path/to/db", CELL, local_ns=local_ns)
+    assert local_ns["g"] is None
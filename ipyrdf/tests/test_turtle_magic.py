@@ -0,0 +1,53 @@
+import asyncio
+import threading
+
+from rdflib import Namespace
+
+from ipyrdf.rdf_diagram import turtle_magic
+from ipyrdf.rdf_diagram.describe_tool import DescribeTool
+from ipyrdf.rdf_diagram.turtle_magic import turtle
+
+EX = Namespace("http://example.org/")
+
+CELL = "@prefix ex: <http://example.org/> . ex:a ex:p ex:b . ex:b ex:p ex:c ."
+
+
+def run_background(tool: DescribeTool, parameters: str, cell: str, local_ns: dict):
+    """Run the magic on an event loop and wait for the background parse"""
+
+    async def main():
+        turtle(parameters, cell, local_ns=local_ns)
+        for _ in range(500):
+            if not tool.loading:
+                return
+            await asyncio.sleep(0.01)
+        raise TimeoutError("background parse did not finish")
+
+    asyncio.run(main())
+
+
+def test_background_append_merges_on_loop(monkeypatch):
+    local_ns = {"g": None}
+    turtle("g", CELL, local_ns=local_ns)
+    local_ns["tool"] = tool = DescribeTool(graph=local_ns["g"], uris=None)
+    threads = []
+    add_missing = turtle_magic.add_missing
+
+    def recorded(graph, other):
+        threads.append(threading.current_thread())
+        return add_missing(graph, other)
+
+    monkeypatch.setattr(turtle_magic, "add_missing", recorded)
+    run_background(tool, "tool --append --background", "ex:c ex:p ex:d .", local_ns)
+    assert threads == [threading.main_thread()]
+    assert (EX.c, EX.p, EX.d) in tool.graph
+    assert len(tool.loader.partition.edges) == 3
+
+
+def test_background_parse_error_resets_loading():
+    local_ns = {"g": None}
+    turtle("g", CELL, local_ns=local_ns)
+    local_ns["tool"] = tool = DescribeTool(graph=local_ns["g"], uris=None)
+    run_background(tool, "tool --append --background", "ex:c ex:p", local_ns)
+    assert not tool.loading
+    assert len(tool.graph) == 2
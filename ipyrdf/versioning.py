@@ -0,0 +1,84 @@
+"""Graph with a change counter and a bounded log of the changed triples"""
+from collections import deque
+from typing import Iterable, Optional, Set, Tuple
+
+from rdflib import Graph
+from rdflib.term import Node
+
+Triple = Tuple[Node, Node, Node]
+Changes = Tuple[Set[Triple], Set[Triple]]
+
+
+class VersionedGraph(Graph):
+    """Graph that counts the triples added and removed through it.
+
+    Every effective change increments `version` and is recorded in a changelog
+    holding up to `changelog_size` entries, so consumers can check if the graph
+    changed since they last looked and fetch just the changes.
+
+    Changes made directly on the underlying store bypass the counter.
+    """
+
+    def __init__(self, *args, changelog_size: int = 10_000, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.version = 0
+        self._changelog = deque(maxlen=changelog_size)
+
+    def _log(self, added: bool, triples: Iterable[Triple]):
+        for triple in triples:
+            self.version += 1
+            self._changelog.append((self.version, added, triple))
+
+    def add(self, triple: Triple):
+        if triple in self:
+            return self
+        super().add(triple)
+        self._log(True, [triple])
+        return self
+
+    def addN(self, quads):
+        fresh = {}
+        for s, p, o, c in quads:
+            triple = (s, p, o)
+            ours = c is self or (
+                isinstance(c, Graph) and c.identifier == self.identifier
+            )
+            if ours and triple not in fresh and triple not in self:
+                fresh[triple] = None
+        super().addN((s, p, o, self) for s, p, o in fresh)
+        self._log(True, fresh)
+        return self
+
+    def remove(self, triple):
+        removed = list(self.triples(triple))
+        super().remove(triple)
+        self._log(False, removed)
+        return self
+
+    def changes_since(self, version: int) -> Optional[Changes]:
+        """Net triples added and removed since the given version
+
+        :param version: version previously read from the graph
+        :return: added and removed triples, `None` if the changelog no longer
+        reaches back to that version
+        """
+        if version == self.version:
+            return set(), set()
+        log = self._changelog
+        if version > self.version or not log or log[0][0] > version + 1:
+            return None
+        # net effect per triple: compare the first and the last operation
+        first, last = {}, {}
+        for changed, added, triple in reversed(log):
+            if changed <= version:
+                break
+            first[triple] = added
+            last.setdefault(triple, added)
+        added = {t for t, op in last.items() if op and first[t]}
+        removed = {t for t, op in last.items() if not op and not first[t]}
+        return added, removed
+
+
+def graph_version(graph: Graph) -> Optional[int]:
+    """Version of the graph if it is tracked, otherwise `None`"""
+    return getattr(graph, "version", None)